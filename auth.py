@@ -1,9 +1,15 @@
+import hashlib
+import time
 from datetime import timedelta, datetime, timezone
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError, ExpiredSignatureError
-from sqlmodel import Session, select
-from db import get_session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from cache import TTLCache
+from db import async_session, get_async_read_session
 from models import Customer
 from config import settings
 
@@ -14,24 +20,73 @@ def create_access_token(username: str) -> str:
     token = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return token
 
+# sha256(token) -> verified claims, so a bearer token is only verified once while valid
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=settings.access_token_expire_minutes * 60)
+
 def decode_access_token(token: str):
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    # Expire the entry exactly when the token does; tokens without exp are not cached
+    token_cache.set(digest, payload, ttl=payload.get("exp", 0) - time.time())
+    return payload
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/logon")
 
-def get_current_customer(
+# username -> Customer snapshot, so repeat callers skip the lookup query
+principal_cache = TTLCache(maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl_seconds)
+
+def detached_copy(customer: Customer) -> Customer:
+    """Column-only copy of a customer, bound to no session.
+
+    Safe to share across requests; `session.add` re-attaches it as the
+    existing row, so relationships such as `accounts` can still be used.
+    """
+    copy = Customer(**customer.model_dump())
+    make_transient_to_detached(copy)
+    return copy
+
+def cache_principal(customer: Customer, expires_at: float | None = None):
+    ttl = None if expires_at is None else expires_at - time.time()
+    principal_cache.set(customer.username, detached_copy(customer), ttl=ttl)
+
+def invalidate_principal(username: str):
+    principal_cache.pop(username)
+
+@event.listens_for(Customer, "after_update")
+@event.listens_for(Customer, "after_delete")
+def _invalidate_changed_customer(mapper, connection, target: Customer):
+    invalidate_principal(target.username)
+    for old_username in inspect(target).attrs.username.history.deleted:
+        invalidate_principal(old_username)
+
+async def get_current_customer(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ) -> Customer:
     payload = decode_access_token(token)
     username = payload.get("sub")
-    customer = session.exec(select(Customer).where(Customer.username == username)).first()
+    cached = principal_cache.get(username)
+    if cached is not None:
+        return detached_copy(cached)
+
+    statement = select(Customer).where(Customer.username == username)
+    customer = (await session.exec(statement)).first()
+    if not customer and settings.read_replica_url:
+        # The replica may lag behind a registration that just happened
+        async with async_session() as primary:
+            customer = (await primary.exec(statement)).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return customer
+    # Never cache a principal for longer than its token is valid
+    cache_principal(customer, expires_at=payload["exp"])
+    return detached_copy(customer)
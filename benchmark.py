@@ -0,0 +1,341 @@
+"""Load test and benchmark for the API flows.
+
+Virtual users run register -> logon -> open_account -> overview (or
+transfers) against the app, either in-process through httpx's ASGI
+transport or against a real uvicorn process. Latency percentiles,
+throughput and DB queries per request (from the Server-Timing header) are
+reported per endpoint and can be saved as JSON and gated against a
+previous run:
+
+    uv run python benchmark.py --users 200 --concurrency 20 --output bench.json
+    uv run python benchmark.py --server --baseline bench.json --max-regression 0.2
+
+The transfers scenario has every user pay into the same --hot-accounts
+accounts, reporting booked transfers/sec under contention on those rows:
+
+    uv run python benchmark.py --scenario transfers --users 100 --concurrency 20
+
+--serialization instead measures building the /accounts/overview response
+for 10, 1,000 and 10,000 accounts, validated (default) versus fast_responses.
+
+Unless --database-url is given, each run uses a fresh SQLite file. Rate
+limiting is disabled, as all virtual users share one client address.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from faker import Faker
+from httpx import AsyncClient, ASGITransport, Response
+
+SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+fake = Faker()
+
+
+class Recorder:
+    """Collects latency and query counts per endpoint."""
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.queries: dict[str, list[int]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(self, name: str, request, expected: int) -> Response:
+        started = time.perf_counter()
+        response = await request
+        self.latencies[name].append(time.perf_counter() - started)
+        match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+        if match:
+            self.queries[name].append(int(match.group(1)))
+        if response.status_code != expected:
+            self.errors[name] += 1
+        return response
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def onboard(client: AsyncClient, recorder: Recorder) -> dict | None:
+    """Register and log on a new customer; returns their auth headers."""
+    username = f"{fake.user_name()[:11]}{os.urandom(4).hex()}"
+    response = await recorder.call("register", client.post("/customers/register", json={
+        "name": fake.name(),
+        "dob": fake.date_of_birth(minimum_age=18, maximum_age=70).isoformat(),
+        "address": fake.address(),
+        "country": "NL",
+        "id_document": fake.bothify(text="ID#######"),
+        "username": username,
+    }), expected=201)
+    if response.status_code != 201:
+        return None
+    response = await recorder.call("logon", client.post(
+        "/auth/logon", data={"username": username, "password": response.json()["password"]}
+    ), expected=200)
+    if response.status_code != 200:
+        return None
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def account_flow(client: AsyncClient, recorder: Recorder, shared: dict, *, accounts: int, overviews: int, **_):
+    headers = await onboard(client, recorder)
+    if headers is None:
+        return
+    for _ in range(accounts):
+        await recorder.call("open_account", client.post(
+            "/accounts/open", headers=headers, json={"account_type": "saving", "currency": "EUR"}
+        ), expected=201)
+    for _ in range(overviews):
+        await recorder.call("overview", client.get("/accounts/overview", headers=headers), expected=200)
+
+
+def fund(iban: str, amount: Decimal):
+    # There is no deposit endpoint; the benchmark process shares the database with the app
+    from db import fund_account, get_session
+    with next(get_session()) as session:
+        fund_account(session, iban, amount)
+
+
+async def transfer_flow(client: AsyncClient, recorder: Recorder, shared: dict, *,
+                        transfers: int, hot_accounts: int, **_):
+    """Every user pays into the same few accounts, so all credits contend on those rows."""
+    headers = await onboard(client, recorder)
+    if headers is None:
+        return
+    iban = (await client.get("/accounts/overview", headers=headers)).json()["accounts"][0]["iban"]
+    hot = shared.setdefault("hot_ibans", [])
+    if len(hot) < hot_accounts:
+        hot.append(iban)
+        return
+    fund(iban, Decimal(transfers))
+    for i in range(transfers):
+        await recorder.call("transfer", client.post("/transfers", headers=headers, json={
+            "from_iban": iban, "to_iban": hot[i % len(hot)], "amount": "1.00",
+        }), expected=201)
+
+
+SCENARIOS = {"accounts": account_flow, "transfers": transfer_flow}
+
+
+async def run_benchmark(
+    client: AsyncClient,
+    *,
+    scenario: str = "accounts",
+    users: int = 50,
+    concurrency: int = 10,
+    accounts: int = 2,
+    overviews: int = 5,
+    transfers: int = 20,
+    hot_accounts: int = 1,
+) -> dict:
+    """Run `users` virtual users, at most `concurrency` at a time, and summarise per endpoint."""
+    recorder = Recorder()
+    flow = SCENARIOS[scenario]
+    shared = {}
+    remaining = iter(range(users))
+
+    async def worker():
+        for _ in remaining:
+            await flow(client, recorder, shared, accounts=accounts, overviews=overviews,
+                       transfers=transfers, hot_accounts=hot_accounts)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name, latencies in recorder.latencies.items():
+        queries = recorder.queries.get(name)
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": recorder.errors.get(name, 0),
+            "throughput_rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "queries_per_request": sum(queries) / len(queries) if queries else None,
+        }
+    return {
+        "scenario": scenario,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "users": users,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "endpoints": endpoints,
+    }
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Endpoints whose p95 latency grew, or throughput shrank, by more than max_regression."""
+    regressions = []
+    for name, current in result["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']:.0f} -> "
+                               f"{current['throughput_rps']:.0f} req/s")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_report(result: dict):
+    print(f"{result['scenario']}: {result['users']} users, concurrency {result['concurrency']}, "
+          f"{result['elapsed_s']:.2f}s")
+    print(f"{'endpoint':<14}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'queries':>9}")
+    for name, e in result["endpoints"].items():
+        queries = "-" if e["queries_per_request"] is None else f"{e['queries_per_request']:.1f}"
+        print(f"{name:<14}{e['requests']:>9}{e['errors']:>8}{e['throughput_rps']:>9.0f}{e['p50_ms']:>9.1f}"
+              f"{e['p95_ms']:>9.1f}{e['p99_ms']:>9.1f}{queries:>9}")
+
+
+async def run_serialization(sizes: tuple[int, ...] = (10, 1_000, 10_000), repeat: int = 20) -> dict:
+    """Median cost of turning ORM accounts into overview response bytes, per response mode."""
+    from uuid import uuid4
+    from fastapi.routing import serialize_response
+    from models import Account
+    from responses import fields_of, json_response
+    from routers import account_router
+    from schemas import AccountPublic, AccountsResponse
+
+    field = next(route for route in account_router.routes if route.path == "/accounts/overview").response_field
+    message = "Accounts retrieved successfully"
+    results = {}
+    for size in sizes:
+        accounts = [
+            Account(iban=f"NL00OBAP{i:010d}", balance_minor=123456, currency="EUR", customer_id=uuid4())
+            for i in range(size)
+        ]
+
+        async def validated():
+            # What FastAPI does for a route returning a model with response_model set
+            content = AccountsResponse(message=message, accounts=accounts, next_cursor=None)
+            return await serialize_response(field=field, response_content=content, dump_json=True)
+
+        async def fast():
+            return json_response({
+                "message": message, "accounts": [fields_of(AccountPublic, a) for a in accounts], "next_cursor": None
+            }).body
+
+        timings = {}
+        for name, build in [("validated", validated), ("fast", fast)]:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await build()
+                samples.append(time.perf_counter() - started)
+            timings[f"{name}_ms"] = percentile(samples, 50) * 1000
+        timings["speedup"] = timings["validated_ms"] / timings["fast_ms"]
+        results[str(size)] = timings
+    return {"scenario": "serialization", "started_at": datetime.now(timezone.utc).isoformat(), "sizes": results}
+
+
+def print_serialization_report(result: dict):
+    print(f"{'accounts':>9}{'validated ms':>14}{'fast ms':>10}{'speedup':>9}")
+    for size, t in result["sizes"].items():
+        print(f"{size:>9}{t['validated_ms']:>14.2f}{t['fast_ms']:>10.2f}{t['speedup']:>8.1f}x")
+
+
+async def run_in_process(**options) -> dict:
+    # Imported late: the environment has to be set up before config is loaded
+    from db import init_db
+    from main import app
+    init_db()  # the ASGI transport does not run the lifespan
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        return await run_benchmark(client, **options)
+
+
+async def run_against_server(port: int, **options) -> dict:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with AsyncClient(base_url=base_url, timeout=30) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except Exception:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError(f"Server at {base_url} did not become healthy")
+            return await run_benchmark(client, **options)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the OpenBankAPI flows.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="accounts")
+    parser.add_argument("--users", type=int, default=50, help="virtual users, each running the flow once")
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users running at the same time")
+    parser.add_argument("--accounts", type=int, default=2, help="accounts opened per user")
+    parser.add_argument("--overviews", type=int, default=5, help="overview calls per user")
+    parser.add_argument("--transfers", type=int, default=20, help="transfers per user (transfers scenario)")
+    parser.add_argument("--hot-accounts", type=int, default=1,
+                        help="accounts all transfers are paid into (transfers scenario)")
+    parser.add_argument("--serialization", action="store_true",
+                        help="benchmark overview response serialization at 10/1,000/10,000 accounts instead")
+    parser.add_argument("--server", action="store_true", help="run against a uvicorn process instead of in-process")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-url", help="database to run against (default: a fresh SQLite file)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed relative p95/throughput regression against the baseline")
+    args = parser.parse_args(argv)
+
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{tempfile.mkdtemp(prefix='openbank-bench-')}/bench.sqlite"
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    if args.serialization:
+        result = asyncio.run(run_serialization())
+        print_serialization_report(result)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+        return 0
+
+    options = dict(scenario=args.scenario, users=args.users, concurrency=args.concurrency,
+                   accounts=args.accounts, overviews=args.overviews, transfers=args.transfers,
+                   hot_accounts=args.hot_accounts)
+    if args.server:
+        result = asyncio.run(run_against_server(args.port, **options))
+    else:
+        result = asyncio.run(run_in_process(**options))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
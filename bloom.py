@@ -0,0 +1,42 @@
+"""Bloom filter: set membership in a fixed amount of memory, with false positives but no false negatives."""
+import hashlib
+import math
+
+
+class BloomFilter:
+    """Sized for `capacity` items at `false_positive_rate`.
+
+    `item in bloom` being False is definite; True means "probably", with the
+    false-positive rate rising past the target once more than `capacity`
+    items were added. Positions come from one 128-bit blake2b digest split
+    into two halves (Kirsch-Mitzenmacher double hashing).
+    """
+    def __init__(self, capacity: int, false_positive_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate at the current item count."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
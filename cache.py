@@ -0,0 +1,125 @@
+"""Small in-process caches for hot lookups that can tolerate bounded staleness."""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a time-to-live.
+
+    `ttl` is the ceiling; `set` may pass a shorter per-entry ttl. Lookups and
+    inserts are O(1) and thread-safe. A `maxsize` of 0 disables caching.
+    """
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self._clock() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ReferenceData:
+    """In-memory copy of a small table that almost never changes.
+
+    Subclasses implement `fetch`. The copy is loaded on first use, reloaded by
+    `refresh_forever` and dropped by `invalidate`, which `invalidate_on_changes`
+    hooks up to ORM writes of a model in this process.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._data = None
+        self._loaded_at = 0.0
+        self.loads = 0
+
+    async def fetch(self):
+        raise NotImplementedError
+
+    async def load(self):
+        self._data = await self.fetch()
+        self._loaded_at = time.monotonic()
+        self.loads += 1
+
+    async def get(self):
+        if self._data is None:
+            await self.load()
+        return self._data
+
+    def invalidate(self):
+        self._data = None
+
+    def invalidate_on_changes(self, model: type):
+        for identifier in ("after_insert", "after_update", "after_delete"):
+            event.listen(model, identifier, lambda mapper, connection, target: self.invalidate())
+
+    async def refresh_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load()
+            except Exception:
+                # Keep serving the last known copy, try again next interval
+                logger.exception("Refreshing the %s failed", self.name)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": len(self._data or ()),
+            "loads": self.loads,
+            "age_seconds": time.monotonic() - self._loaded_at if self._data is not None else 0,
+        }
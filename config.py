@@ -6,7 +6,84 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
+    # Authenticated customers kept in memory by token subject; 0 disables the cache
+    principal_cache_size: int = 10_000
+    principal_cache_ttl_seconds: int = 60
+    # Verified token claims kept until each token's exp; 0 disables the cache
+    token_cache_size: int = 100_000
+
+    # Skip create_all, migrations and reference data when the schema version is already the latest
+    fast_startup: bool = False
+    # Log every SQL statement; expensive, for debugging only
+    db_echo: bool = False
+    # Connection pool of every engine (ignored for in-memory SQLite)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Optional read replica for overview, health and token validation
+    read_replica_url: str | None = None
+    async_read_replica_url: str | None = None
+    read_replica_retry_seconds: float = 30
+    # Serve requests through an AsyncEngine/AsyncSession instead of the blocking Session
+    db_async: bool = False
+    # Defaults to database_url with its asyncio driver (e.g. sqlite+aiosqlite)
+    async_database_url: str | None = None
+
+    # Account IBANs: NLkk OBAP nnnnnnnnnn, numbers reserved from the database in blocks
+    iban_country_code: str = "NL"
+    iban_bank_code: str = "OBAP"
+    iban_block_size: int = 1000
+
+    # scrypt cost; changing it rehashes passwords on their next logon
+    password_hash_n: int = 2**14
+    password_hash_r: int = 8
+    password_hash_p: int = 1
+    # Hashing threads, and running plus queued hashes before logons are turned away
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+
+    # Token buckets on the credential endpoints: requests per minute on average, and burst size
+    rate_limit_enabled: bool = True
+    rate_limit_max_keys: int = 100_000
+    logon_ip_rate_per_minute: int = 60
+    logon_ip_burst: int = 20
+    logon_username_rate_per_minute: int = 10
+    logon_username_burst: int = 5
+    register_ip_rate_per_minute: int = 20
+    register_ip_burst: int = 10
+    username_check_ip_rate_per_minute: int = 60
+    username_check_ip_burst: int = 20
+
+    # Background database probe behind /health and /health/ready
+    health_probe_interval_seconds: float = 5
+    health_probe_timeout_seconds: float = 2
+
+    # Seconds between reloads of the in-memory allowed country list
+    allowed_countries_refresh_seconds: float = 300
+    # Seconds between reloads of the in-memory FX rates used by the account summary
+    fx_rates_refresh_seconds: float = 300
+    # Bloom filter of registered usernames, sized for this many (or twice the registered count) at this
+    # false-positive rate, and rebuilt this often to pick up other workers' registrations
+    username_filter_capacity: int = 1_000_000
+    username_filter_false_positive_rate: float = 0.01
+    username_filter_refresh_seconds: float = 600
+
+    # Responses kept for Idempotency-Key replays, in memory and in the idempotencykey table
+    idempotency_ttl_seconds: int = 3600
+    idempotency_cache_size: int = 10_000
+    idempotency_purge_seconds: float = 600
+
+    # Commit concurrent registrations together, in batches of up to this many, waiting at most this long
+    register_group_commit: bool = False
+    register_batch_size: int = 64
+    register_batch_delay_ms: float = 5
+
+    # Serialize account and auth responses straight from ORM data, skipping re-validation
+    fast_responses: bool = False
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,25 @@
+"""In-memory allow-list of the countries customers may register from.
+
+The allowedcountry table almost never changes, so it is loaded once and then
+refreshed every `allowed_countries_refresh_seconds` by a background task.
+Changes to AllowedCountry made through the ORM in this process, and explicit
+`invalidate()` calls, make the next check reload it. Registration checks the
+list without a database round trip.
+"""
+from sqlmodel import select
+from cache import ReferenceData
+from db import async_session
+from models import AllowedCountry
+
+
+class AllowedCountries(ReferenceData):
+    async def fetch(self) -> frozenset[str]:
+        async with async_session() as session:
+            return frozenset((await session.exec(select(AllowedCountry.iso_code))).all())
+
+    async def is_allowed(self, iso_code: str) -> bool:
+        return iso_code in await self.get()
+
+
+allowed_countries = AllowedCountries("allowed countries")
+allowed_countries.invalidate_on_changes(AllowedCountry)
@@ -1,21 +1,280 @@
-from sqlmodel import SQLModel, create_engine, Session
+import logging
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from fastapi import Depends
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Callable
+from sqlalchemy import insert, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel, create_engine, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from config import settings
-from models import AllowedCountry
+from migrations import migrate, schema_is_current
+from models import Account, AllowedCountry, FxRate
+import money
 
-engine = create_engine(settings.database_url, echo=True)
+logger = logging.getLogger(__name__)
+
+def engine_options(url: str) -> dict:
+    """create_engine arguments for the configured pool."""
+    options = {"echo": settings.db_echo, "pool_pre_ping": settings.db_pool_pre_ping}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options  # in-memory SQLite lives in one connection, there is no pool to size
+    return options | {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+_engine: Engine | None = None
+_read_engines: dict[str, Engine] = {}
+_async_engines: dict[str, AsyncEngine] = {}
+# Reads go to the primary until this time after the replica failed
+_replica_retry_at = 0.0
+replica_fallbacks = 0
+
+# asyncio driver used for each backend when no explicit async_database_url is configured
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def get_engine() -> Engine:
+    """The primary engine, created on first use: importing this module opens no pool."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+    return _engine
+
+def __getattr__(name: str):
+    # `db.engine` keeps working for callers, without creating the engine at import time
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def insert_ignoring_duplicates(session: Session, model: type[SQLModel], rows: list[dict]):
+    """Bulk insert rows, skipping those whose primary key already exists."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        statement = sqlite_insert(model).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        statement = postgresql_insert(model).on_conflict_do_nothing()
+    else:
+        key = inspect(model).primary_key[0]
+        existing = set(session.exec(select(key).where(key.in_([row[key.name] for row in rows]))).all())
+        rows = [row for row in rows if row[key.name] not in existing]
+        statement = insert(model)
+    if rows:
+        session.execute(statement, rows)
 
 def insert_allowed_countries(session: Session):
     initial_allowed_countries = ["NL", "BE", "DE"]
-    for country in initial_allowed_countries:
-        if not session.get(AllowedCountry, country):
-            session.add(AllowedCountry(iso_code=country))
+    insert_ignoring_duplicates(session, AllowedCountry, [{"iso_code": country} for country in initial_allowed_countries])
     session.commit()
 
-def init_db():
+def insert_fx_rates(session: Session):
+    # Starting points only; the fxrate table is where rates are maintained
+    initial_rates = {"EUR": "1", "GBP": "1.17", "USD": "0.92", "CAD": "0.68", "CNY": "0.13"}
+    now = datetime.now(timezone.utc)
+    insert_ignoring_duplicates(session, FxRate, [
+        {"currency": currency, "eur_rate": Decimal(rate), "updated_at": now} for currency, rate in initial_rates.items()
+    ])
+    session.commit()
+
+def fund_account(session: Session, iban: str, amount: Decimal):
+    """Set an account's balance directly. There is no deposit endpoint; tests and the benchmark use this."""
+    account = session.exec(select(Account).where(Account.iban == iban)).one()
+    account.balance_minor = money.to_minor(amount, account.currency)
+    session.add(account)
+    session.commit()
+
+def init_db() -> bool:
+    """Create and migrate the schema and insert reference data; returns whether any DDL ran.
+
+    With `fast_startup`, a database already at the latest schema version is
+    left alone: one query instead of inspecting every table.
+    """
+    engine = get_engine()
+    if settings.fast_startup and schema_is_current(engine):
+        return False
     SQLModel.metadata.create_all(engine)
+    migrate(engine)
     with Session(engine) as session:
         insert_allowed_countries(session)
+        insert_fx_rates(session)
+    return True
 
 def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+    with Session(get_engine()) as session:
+        yield session
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No asyncio driver known for '{parsed.drivername}', set the async URL explicitly")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+def get_async_database_url() -> str:
+    return settings.async_database_url or to_async_url(settings.database_url)
+
+def _async_engine_for(url: str) -> AsyncEngine:
+    if url not in _async_engines:
+        _async_engines[url] = create_async_engine(url, **engine_options(url))
+    return _async_engines[url]
+
+def get_async_engine() -> AsyncEngine:
+    """Create the async engine on first use, so sync-only processes (seed.py, tests) never need it."""
+    return _async_engine_for(get_async_database_url())
+
+def get_read_engine() -> Engine:
+    url = settings.read_replica_url
+    if url not in _read_engines:
+        _read_engines[url] = create_engine(url, **engine_options(url))
+    return _read_engines[url]
+
+def get_async_read_engine() -> AsyncEngine:
+    return _async_engine_for(settings.async_read_replica_url or to_async_url(settings.read_replica_url))
+
+async def dispose_async_engine():
+    for async_engine in _async_engines.values():
+        await async_engine.dispose()
+    _async_engines.clear()
+
+def pool_stats() -> dict[str, float]:
+    """Connection counts of every pool that has been created, plus replica fallbacks."""
+    pools = {"primary": _engine.pool} if _engine is not None else {}
+    pools |= {f"replica_{i}": e.pool for i, e in enumerate(_read_engines.values())}
+    pools |= {f"async_{i}": e.sync_engine.pool for i, e in enumerate(_async_engines.values())}
+    stats = {"replica_fallbacks": replica_fallbacks}
+    for name, pool in pools.items():
+        for metric in ["size", "checkedin", "checkedout", "overflow"]:
+            if hasattr(pool, metric):
+                stats[f"{name}_{metric}"] = getattr(pool, metric)()
+    return stats
+
+
+class AwaitableSession:
+    """A sync Session behind the AsyncSession call signatures.
+
+    Lets routers keep a single code path: with `db_async` disabled the awaits
+    complete immediately on the blocking Session, exactly as before.
+    """
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def exec(self, statement, **kwargs):
+        return self.sync_session.exec(statement, **kwargs)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return self.sync_session.execute(statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return self.sync_session.scalar(statement, params, **kwargs)
+
+    async def stream(self, statement, params=None, **kwargs):
+        return AwaitableResult(self.sync_session.execute(statement, params, **kwargs))
+
+    async def get(self, entity, ident, **kwargs):
+        return self.sync_session.get(entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        self.sync_session.delete(instance)
+
+    async def flush(self):
+        self.sync_session.flush()
+
+    async def refresh(self, instance, attribute_names=None):
+        self.sync_session.refresh(instance, attribute_names)
+
+    async def commit(self):
+        self.sync_session.commit()
+
+    async def rollback(self):
+        self.sync_session.rollback()
+
+    async def connection(self):
+        return self.sync_session.connection()
+
+    async def close(self):
+        self.sync_session.close()
+
+
+class AwaitableResult:
+    """A sync Result behind the AsyncResult calls used for streaming."""
+    def __init__(self, result):
+        self.sync_result = result
+
+    async def partitions(self, size: int | None = None):
+        for partition in self.sync_result.partitions(size):
+            yield partition
+
+    async def close(self):
+        self.sync_result.close()
+
+
+@asynccontextmanager
+async def _session_on(sync_engine: Callable[[], Engine], async_engine: Callable[[], AsyncEngine]):
+    if settings.db_async:
+        async with AsyncSession(async_engine(), expire_on_commit=False) as session:
+            yield session
+    else:
+        with Session(sync_engine(), expire_on_commit=False) as session:
+            yield AwaitableSession(session)
+
+@asynccontextmanager
+async def async_session() -> AsyncIterator[AsyncSession]:
+    """Open a session in the configured mode (AsyncSession, or the blocking Session wrapped)."""
+    async with _session_on(get_engine, get_async_engine) as session:
+        yield session
+
+@asynccontextmanager
+async def async_read_session() -> AsyncIterator[AsyncSession]:
+    """Session for reads: on the replica when one is configured and reachable, else on the primary.
+
+    A replica that fails at connection checkout is skipped for
+    `read_replica_retry_seconds`, so an outage does not cost every request a timeout.
+    """
+    global _replica_retry_at, replica_fallbacks
+    if not settings.read_replica_url or time.monotonic() < _replica_retry_at:
+        async with async_session() as session:
+            yield session
+        return
+
+    async with AsyncExitStack() as stack:
+        try:
+            session = await stack.enter_async_context(_session_on(get_read_engine, get_async_read_engine))
+            await session.connection()
+        except (DBAPIError, OSError):
+            logger.warning("Read replica unavailable, reading from the primary", exc_info=True)
+            replica_fallbacks += 1
+            _replica_retry_at = time.monotonic() + settings.read_replica_retry_seconds
+            session = await stack.enter_async_context(async_session())
+        yield session
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with async_session() as session:
+        yield session
+
+async def get_async_read_session(primary: AsyncSession = Depends(get_async_session)) -> AsyncIterator[AsyncSession]:
+    """Read-only dependency. Without a replica it is the request's primary session, not a second one."""
+    if not settings.read_replica_url:
+        yield primary
+        return
+    async with async_read_session() as session:
+        yield session
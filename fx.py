@@ -0,0 +1,28 @@
+"""In-memory FX rates for totals converted to one currency.
+
+Loaded from the fxrate table and refreshed every `fx_rates_refresh_seconds`
+by a background task, like the allowed countries. Changes to FxRate made
+through the ORM in this process make the next conversion reload them.
+"""
+from decimal import Decimal
+from sqlmodel import select
+from cache import ReferenceData
+from db import async_session
+from models import FxRate
+import money
+
+
+class FxRates(ReferenceData):
+    async def fetch(self) -> dict[str, Decimal]:
+        async with async_session() as session:
+            return dict((await session.exec(select(FxRate.currency, FxRate.eur_rate))).all())
+
+    async def convert(self, amounts: dict[str, Decimal], target: str) -> Decimal:
+        """Sum amounts keyed by currency in `target`. Raises KeyError for a currency without a rate."""
+        rates = await self.get()
+        in_eur = sum((amount * rates[currency] for currency, amount in amounts.items()), Decimal(0))
+        return money.quantize(in_eur / rates[target], target)
+
+
+fx_rates = FxRates("FX rates")
+fx_rates.invalidate_on_changes(FxRate)
@@ -0,0 +1,163 @@
+"""Group commit for registration bursts.
+
+With `register_group_commit` enabled, registrations are not committed one
+by one. Each is queued, and the queue is flushed when `register_batch_size`
+registrations are waiting or `register_batch_delay_ms` after the first one
+arrived, whichever comes first. A flush checks the usernames of the whole
+batch in one query, inserts all customers and all accounts with one
+multi-row INSERT each, and commits once, so a burst costs one fsync per
+batch instead of one per registration. Every caller still gets its own
+outcome: success, or 409 for a taken username.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from config import settings
+from db import async_session
+from models import Account, Customer
+
+
+@dataclass
+class _Registration:
+    customer: dict
+    account: dict
+    future: asyncio.Future
+    queued_at: float
+
+
+class RegistrationBatcher:
+    def __init__(self, max_batch: int, max_delay: float):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: list[_Registration] = []
+        self._timer: asyncio.Task | None = None
+        # Flushes run in tasks of their own, a cancelled caller cannot abort a batch others wait on
+        self._flushes: set[asyncio.Task] = set()
+        self.batches = 0
+        self.registrations = 0
+        self.largest_batch = 0
+        self.wait_seconds = 0.0
+        self.longest_wait_seconds = 0.0
+
+    async def submit(self, customer: Customer, account: Account):
+        """Queue a customer and their first account; returns once committed, raises 409 for a taken username."""
+        registration = _Registration(
+            customer=customer.model_dump(),
+            account=account.model_dump(),
+            future=asyncio.get_running_loop().create_future(),
+            queued_at=time.perf_counter(),
+        )
+        self._pending.append(registration)
+        if len(self._pending) >= self.max_batch:
+            # The registration that fills the batch flushes it, no need to wait for the timer
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            flush = asyncio.create_task(self._flush())
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        await registration.future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending and self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        if not batch:
+            return
+
+        flushed_at = time.perf_counter()
+        self.batches += 1
+        self.registrations += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for registration in batch:
+            self.wait_seconds += flushed_at - registration.queued_at
+            self.longest_wait_seconds = max(self.longest_wait_seconds, flushed_at - registration.queued_at)
+
+        try:
+            await self._commit(batch)
+        except Exception as e:
+            for registration in batch:
+                _settle(registration, e)
+        except BaseException:
+            # Cancelled, at shutdown: nobody may be left waiting on a batch that will not commit
+            for registration in batch:
+                registration.future.cancel()
+            raise
+
+    async def _commit(self, batch: list[_Registration]):
+        async with async_session() as session:
+            usernames = [r.customer["username"] for r in batch]
+            taken = set((await session.exec(select(Customer.username).where(Customer.username.in_(usernames)))).all())
+            accepted = []
+            for registration in batch:
+                if registration.customer["username"] in taken:
+                    _settle(registration, HTTPException(status_code=409, detail="Username already exists"))
+                else:
+                    taken.add(registration.customer["username"])  # the same username twice in one batch
+                    accepted.append(registration)
+            if not accepted:
+                return
+
+            try:
+                await session.exec(insert(Customer).values([r.customer for r in accepted]))
+                await session.exec(insert(Account).values([r.account for r in accepted]))
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                # Another worker took one of the usernames since the check, find out which one by one
+                for registration in accepted:
+                    await self._commit_one(session, registration)
+                return
+            for registration in accepted:
+                _settle(registration)
+
+    @staticmethod
+    async def _commit_one(session, registration: _Registration):
+        try:
+            await session.exec(insert(Customer).values(registration.customer))
+            await session.exec(insert(Account).values(registration.account))
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            # Driver messages differ per database; only a username that now exists makes this a conflict
+            username = registration.customer["username"]
+            if (await session.exec(select(Customer.id).where(Customer.username == username))).first() is None:
+                _settle(registration, e)
+                return
+            _settle(registration, HTTPException(status_code=409, detail="Username already exists"))
+            return
+        _settle(registration)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "registrations": self.registrations,
+            "mean_batch_size": self.registrations / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "mean_wait_seconds": self.wait_seconds / self.registrations if self.registrations else 0.0,
+            "longest_wait_seconds": self.longest_wait_seconds,
+        }
+
+
+def _settle(registration: _Registration, error: Exception | None = None):
+    # The caller may have gone away (cancelled) while the batch was committing
+    if registration.future.done():
+        return
+    if error is None:
+        registration.future.set_result(None)
+    else:
+        registration.future.set_exception(error)
+
+
+registrations = RegistrationBatcher(settings.register_batch_size, settings.register_batch_delay_ms / 1000)
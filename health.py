@@ -0,0 +1,99 @@
+"""Database health, probed in the background instead of on every request.
+
+A task pings the primary database every `health_probe_interval_seconds`
+and records whether it answered, how long it took and how saturated the
+connection pool is. The health endpoints answer from that record, so
+orchestrator and load-balancer probes cost no database work and never
+hang on a slow database: a ping that does not answer within
+`health_probe_timeout_seconds` counts as a failure.
+"""
+import asyncio
+import logging
+import time
+from config import settings
+import db
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProbe:
+    def __init__(self, interval: float, timeout: float):
+        self.interval = interval
+        self.timeout = timeout
+        self.database_ok: bool | None = None  # None until the first probe
+        self.error: str | None = None
+        self.latency_seconds = 0.0
+        self.probed_at = 0.0
+        self.probes = 0
+        self.failures = 0
+        self._ping: asyncio.Future | None = None
+
+    async def probe(self):
+        # The ping runs in a thread, a database that hangs cannot block the event loop.
+        # A ping still hanging from a previous probe is waited on rather than piled onto.
+        if self._ping is None or self._ping.done():
+            self._ping = asyncio.ensure_future(asyncio.to_thread(_ping))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ping), self.timeout)
+            self.database_ok, self.error = True, None
+        except asyncio.TimeoutError:
+            self.database_ok, self.error = False, f"no answer within {self.timeout}s"
+        except Exception as e:
+            self.database_ok, self.error = False, f"{type(e).__name__}: {e}"
+        self.latency_seconds = time.perf_counter() - started
+        self.probed_at = time.monotonic()
+        self.probes += 1
+        if not self.database_ok:
+            self.failures += 1
+            logger.warning("Database health probe failed: %s", self.error)
+
+    async def probe_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.probe()
+
+    async def current(self) -> dict:
+        """The last probe's outcome; probes on demand when the background task is not running."""
+        if self.database_ok is None or self.age_seconds() > 3 * self.interval:
+            await self.probe()
+        saturation = pool_saturation()
+        stale = self.age_seconds() > 3 * self.interval
+        return {
+            "status": "ok" if self.database_ok and not stale and saturation < 1 else "unavailable",
+            "database": "connected" if self.database_ok else "unavailable",
+            "error": self.error,
+            "latency_ms": self.latency_seconds * 1000,
+            "age_seconds": self.age_seconds(),
+            "pool_saturation": saturation,
+            "pool": db.pool_stats(),
+        }
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.probed_at if self.probed_at else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "database_ok": 1 if self.database_ok else 0,
+            "latency_seconds": self.latency_seconds,
+            "age_seconds": self.age_seconds(),
+            "probes": self.probes,
+            "failures": self.failures,
+            "pool_saturation": pool_saturation(),
+        }
+
+
+def _ping():
+    with db.get_engine().connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+
+def pool_saturation() -> float:
+    """Checked-out share of the serving pool's capacity; 0 for pools without a fixed size."""
+    pool = db.get_async_engine().sync_engine.pool if settings.db_async else db.get_engine().pool
+    if not hasattr(pool, "checkedout") or not hasattr(pool, "size"):
+        return 0.0
+    capacity = pool.size() + max(settings.db_max_overflow, 0)
+    return pool.checkedout() / capacity if capacity else 0.0
+
+
+probe = HealthProbe(settings.health_probe_interval_seconds, settings.health_probe_timeout_seconds)
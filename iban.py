@@ -0,0 +1,111 @@
+"""Collision-free IBAN allocation.
+
+Account numbers come from the `iban` counter of the sequence table, reserved
+in blocks so the database is hit once per block rather than once per account,
+and unique across workers and restarts. Each number is scrambled by a
+bijection over the 10-digit space, so consecutive accounts do not get
+adjacent IBANs, and formatted with the configured country and bank code.
+Numbers of a block that are never used (e.g. on shutdown) are simply skipped.
+"""
+import asyncio
+import threading
+from collections import deque
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+import db
+from config import settings
+from models import Sequence
+from utils import format_iban
+
+SEQUENCE_NAME = "iban"
+ACCOUNT_NUMBER_SPACE = 10**10
+# Coprime with 10, so multiplying by it permutes the account number space
+SCRAMBLE_MULTIPLIER = 7_305_893_189
+
+
+def reserve_numbers(sequence: str, n: int) -> range:
+    """Atomically reserve n consecutive numbers of a named counter in the sequence table."""
+    for _ in range(2):
+        try:
+            with db.get_engine().begin() as conn:
+                # The UPDATE takes the row lock before the new value is read back
+                bumped = conn.execute(
+                    update(Sequence)
+                    .where(Sequence.name == sequence)
+                    .values(next_value=Sequence.next_value + n)
+                ).rowcount
+                if bumped:
+                    end = conn.execute(
+                        select(Sequence.next_value).where(Sequence.name == sequence)
+                    ).scalar_one()
+                    return range(end - n, end)
+                conn.execute(insert(Sequence).values(name=sequence, next_value=n))
+                return range(0, n)
+        except IntegrityError:
+            continue  # another worker created the counter first, bump it instead
+    raise RuntimeError(f"Could not reserve {sequence} numbers")
+
+def reserve_account_numbers(n: int) -> range:
+    """Atomically reserve n consecutive account numbers."""
+    return reserve_numbers(SEQUENCE_NAME, n)
+
+
+def account_number_to_iban(number: int) -> str:
+    scrambled = number * SCRAMBLE_MULTIPLIER % ACCOUNT_NUMBER_SPACE
+    return format_iban(settings.iban_country_code, settings.iban_bank_code, scrambled)
+
+
+class IbanAllocator:
+    """Hands out pre-reserved IBANs from memory.
+
+    When the pool drops below `low_watermark` the next block is reserved on a
+    background thread, so callers normally never wait for the database.
+    """
+    def __init__(self, block_size: int, low_watermark: int | None = None):
+        self.block_size = block_size
+        self.low_watermark = block_size // 4 if low_watermark is None else low_watermark
+        self._pool: deque[str] = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+    def _reserve(self, n: int) -> list[str]:
+        return [account_number_to_iban(number) for number in reserve_account_numbers(n)]
+
+    def take(self, n: int = 1) -> list[str]:
+        with self._lock:
+            missing = n - len(self._pool)
+            if missing > 0:
+                # Large batches (e.g. seeding) reserve exactly what they need on top of a block
+                self._pool.extend(self._reserve(missing + self.block_size))
+            ibans = [self._pool.popleft() for _ in range(n)]
+            if len(self._pool) < self.low_watermark and not self._refilling:
+                self._refilling = True
+                threading.Thread(target=self._refill, name="iban-refill", daemon=True).start()
+        return ibans
+
+    async def take_async(self, n: int = 1) -> list[str]:
+        """Like take, but waits for a synchronous reservation off the event loop."""
+        if len(self._pool) >= n:
+            return self.take(n)
+        return await asyncio.to_thread(self.take, n)
+
+    def _refill(self):
+        try:
+            ibans = self._reserve(self.block_size)
+            with self._lock:
+                self._pool.extend(ibans)
+        finally:
+            self._refilling = False
+
+
+allocator = IbanAllocator(block_size=settings.iban_block_size)
+
+def generate_ibans(n: int) -> list[str]:
+    """Return n IBANs that no other account, worker or process will ever receive."""
+    return allocator.take(n)
+
+async def generate_ibans_async(n: int) -> list[str]:
+    return await allocator.take_async(n)
@@ -0,0 +1,170 @@
+"""Idempotency-Key support for the write routes.
+
+A client (or the gateway) sends the same `Idempotency-Key` header on every
+retry of one logical request. The first request with a key reserves it in
+the idempotencykey table and runs; its 2xx response is stored there and in an
+in-memory front cache, and replays within `idempotency_ttl_seconds` get that
+response back without redoing any work. Within a process, concurrent
+duplicates wait on a per-key lock and then replay; a duplicate arriving
+at another worker while the first is still running gets 409. Reusing a key
+with a different request body is a client error (422). Failed requests
+release their key, so the retry runs again.
+
+Responses carrying secrets, such as the generated password of a
+registration, are never kept: the cache and the table both get a redacted
+body, so a replay returns the status and a reference to what was created,
+never the secret.
+"""
+import asyncio
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator
+from fastapi import HTTPException, Response
+from pydantic_core import to_json
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from cache import TTLCache
+from config import settings
+from db import async_session
+from locks import KeyedLocks
+from models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class Slot:
+    """What a guarded route does with its key: replay, or run and `respond`."""
+    def __init__(self, key: str | None, replay: Response | None = None):
+        self.key = key
+        self.replay = replay
+        self.stored: tuple[int, bytes] | None = None
+
+    def respond(self, content: Any, status_code: int, replayed: Any = None) -> Any:
+        """Record the route's response for replays; returns what the route should return.
+
+        `content` is a response model instance or a ready Response. Without a
+        key it is passed through untouched. `replayed`, when given, is the body
+        kept for replays instead of the response's, for responses with secrets.
+        """
+        if self.key is None:
+            return content
+        if not isinstance(content, Response):
+            content = Response(to_json(content), status_code=status_code, media_type="application/json")
+        if 200 <= content.status_code < 300:
+            self.stored = (content.status_code, bytes(content.body) if replayed is None else to_json(replayed))
+        return content
+
+
+class IdempotencyStore:
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self._locks = KeyedLocks()
+        self.replays = 0
+        self.conflicts = 0
+
+    @asynccontextmanager
+    async def guard(self, scope: str, key: str | None, payload: Any) -> AsyncIterator[Slot]:
+        if key is None:
+            yield Slot(None)
+            return
+        key = f"{scope}:{key}"
+        fingerprint = hashlib.sha256(to_json(payload)).hexdigest()
+        async with self._locks.hold(key):
+            slot = await self._reserve(key, fingerprint)
+            if slot.replay is not None:
+                yield slot
+                return
+            try:
+                yield slot
+            except BaseException:
+                await self._release(key)
+                raise
+            if slot.stored is None:
+                await self._release(key)
+            else:
+                await self._complete(key, fingerprint, *slot.stored)
+
+    def _replay(self, key: str, fingerprint: str, entry: tuple[str, int, bytes]) -> Slot:
+        stored_fingerprint, status_code, body = entry
+        if stored_fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was used with a different request")
+        self.replays += 1
+        response = Response(body, status_code=status_code, media_type="application/json",
+                            headers={REPLAYED_HEADER: "true"})
+        return Slot(key, replay=response)
+
+    async def _reserve(self, key: str, fingerprint: str) -> Slot:
+        entry = self.cache.get(key)
+        if entry is not None:
+            return self._replay(key, fingerprint, entry)
+
+        now = datetime.now(timezone.utc)
+        async with async_session() as session:
+            # Rows past their expiry count as absent
+            await session.exec(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at < now))
+            session.add(IdempotencyKey(key=key, fingerprint=fingerprint,
+                                       expires_at=now + timedelta(seconds=settings.idempotency_ttl_seconds)))
+            try:
+                await session.commit()
+                return Slot(key)
+            except IntegrityError:
+                await session.rollback()
+            row = (await session.exec(select(IdempotencyKey).where(IdempotencyKey.key == key))).first()
+
+        if row is None:
+            # Released in the meantime by a failed first request on another worker
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+        if row.status_code is None:
+            self.conflicts += 1
+            if row.fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was used with a different request")
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+        entry = (row.fingerprint, row.status_code, row.response_body.encode())
+        self.cache.set(key, entry)
+        return self._replay(key, fingerprint, entry)
+
+    async def _complete(self, key: str, fingerprint: str, status_code: int, body: bytes):
+        self.cache.set(key, (fingerprint, status_code, body))
+        try:
+            async with async_session() as session:
+                await session.exec(
+                    update(IdempotencyKey)
+                    .where(IdempotencyKey.key == key)
+                    .values(status_code=status_code, response_body=body.decode())
+                )
+                await session.commit()
+        except Exception:
+            # The work is done and committed; other workers see the key as in progress until it expires
+            logger.exception("Storing the response for an idempotency key failed")
+
+    async def _release(self, key: str):
+        async with async_session() as session:
+            await session.exec(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            await session.commit()
+
+    async def purge_expired(self) -> int:
+        async with async_session() as session:
+            result = await session.exec(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now(timezone.utc))
+            )
+            await session.commit()
+        return result.rowcount
+
+    async def purge_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.purge_expired()
+            except Exception:
+                logger.exception("Purging expired idempotency keys failed")
+
+    def stats(self) -> dict[str, float]:
+        return {**self.cache.stats(), "replays": self.replays, "conflicts": self.conflicts}
+
+
+store = IdempotencyStore(TTLCache(settings.idempotency_cache_size, settings.idempotency_ttl_seconds))
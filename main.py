@@ -1,18 +1,71 @@
-from fastapi import FastAPI, HTTPException, Depends
-from sqlmodel import Session, select
-from routers import account_router, auth_router, customer_router
-from models import AllowedCountry
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from routers import account_router, auth_router, customer_router, transfer_router
+from routers.transfer import account_locks
 from contextlib import asynccontextmanager
-from db import init_db, get_session
+from db import init_db, dispose_async_engine, pool_stats
+import auth
+from config import settings
+from countries import allowed_countries
+from fx import fx_rates
+import groupcommit
+import health
+import iban
+import idempotency
+import metrics
+import passwords
+import ratelimit
+import startup
+from usernames import usernames
 
+startup.record("import", time.perf_counter() - _import_started)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()          # Startup
+    with startup.phase("schema"):
+        startup.ddl_skipped = not init_db()          # Startup
+    with startup.phase("reference_data"):
+        await allowed_countries.load()
+        await fx_rates.load()
+    with startup.phase("health_probe"):
+        await health.probe.probe()
+    refresh = asyncio.create_task(allowed_countries.refresh_forever(settings.allowed_countries_refresh_seconds))
+    refresh_fx = asyncio.create_task(fx_rates.refresh_forever(settings.fx_rates_refresh_seconds))
+    purge = asyncio.create_task(idempotency.store.purge_forever(settings.idempotency_purge_seconds))
+    probe = asyncio.create_task(health.probe.probe_forever())
+    # Built in the background: until it is ready, username checks go to the database
+    username_filter = asyncio.create_task(usernames.refresh_forever(settings.username_filter_refresh_seconds))
+    startup.report()
     yield
+    refresh.cancel()
+    refresh_fx.cancel()
+    purge.cancel()
+    probe.cancel()
+    username_filter.cancel()
+    await dispose_async_engine()
     print("Goodbye!")  # Shutdown
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.register_collector("principal_cache", auth.principal_cache.stats)
+metrics.register_collector("token_cache", auth.token_cache.stats)
+metrics.register_collector("password_hasher", passwords.hasher.stats)
+metrics.register_collector("rate_limit", ratelimit.stats)
+metrics.register_collector("iban_pool", lambda: {"size": len(iban.allocator)})
+metrics.register_collector("db_pool", pool_stats)
+metrics.register_collector("health", health.probe.stats)
+metrics.register_collector("startup", startup.stats)
+metrics.register_collector("allowed_countries", allowed_countries.stats)
+metrics.register_collector("fx_rates", fx_rates.stats)
+metrics.register_collector("username_filter", usernames.stats)
+metrics.register_collector("idempotency", idempotency.store.stats)
+metrics.register_collector("register_group_commit", groupcommit.registrations.stats)
+metrics.register_collector("transfer_locks", lambda: {"held": len(account_locks), "waits": account_locks.waits})
 
 @app.get(
     "/",
@@ -30,19 +83,51 @@ async def root():
     "/health",
     tags=["Monitoring"],
     summary="Health check",
-    description="Checks service and database availability",
+    description="Service and database availability, from the last background probe",
     responses={
         200: {"description": "Service and database are healthy"},
         503: {"description": "Database is unavailable"}
     }
 )
-async def healthcheck(session: Session = Depends(get_session)):
-    try:
-        session.exec(select(AllowedCountry)).first()
-        return {"status": "ok", "database": "connected"}
-    except Exception:
+async def healthcheck():
+    if (await health.probe.current())["database"] != "connected":
         raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok", "database": "connected"}
+
+@app.get(
+    "/health/live",
+    tags=["Monitoring"],
+    summary="Liveness probe",
+    description="The process is up and serving requests; never touches the database",
+)
+async def liveness():
+    return {"status": "ok"}
+
+@app.get(
+    "/health/ready",
+    tags=["Monitoring"],
+    summary="Readiness probe",
+    description="Status, latency and age of the last database probe, and connection pool usage",
+    responses={
+        200: {"description": "Ready to serve traffic"},
+        503: {"description": "Database unavailable, probe stale, or connection pool exhausted"}
+    }
+)
+async def readiness():
+    current = await health.probe.current()
+    return JSONResponse(current, status_code=200 if current["status"] == "ok" else 503)
+
+@app.get(
+    "/metrics",
+    tags=["Monitoring"],
+    summary="Metrics",
+    description="Per-route latency, status codes, DB queries and cache counters in Prometheus text format",
+    response_class=PlainTextResponse,
+)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 app.include_router(customer_router)
 app.include_router(auth_router)
 app.include_router(account_router)
+app.include_router(transfer_router)
@@ -0,0 +1,163 @@
+"""Request and database instrumentation, exported in Prometheus text format.
+
+MetricsMiddleware records latency, status codes and in-flight requests per
+route template, and adds a Server-Timing header with the request's total
+and database time. SQLAlchemy cursor events, registered for every engine
+(sync and async), count queries and DB time into the current request's
+stats. Other modules' counters are exported through `register_collector`.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PREFIX = "openbank"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+_lock = threading.Lock()
+_latency: dict[tuple[str, str], Histogram] = {}
+_responses: dict[tuple[str, str, int], int] = {}
+_route_queries: dict[tuple[str, str], int] = {}
+_collectors: dict[str, Callable[[], dict[str, float]]] = {}
+in_flight = 0
+db_queries = 0
+db_seconds = 0.0
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Statements on one connection never overlap, a single start time is enough
+    conn.info["query_started"] = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global db_queries, db_seconds
+    elapsed = time.perf_counter() - conn.info["query_started"]
+    with _lock:
+        db_queries += 1
+        db_seconds += elapsed
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def register_collector(name: str, collect: Callable[[], dict[str, float]]):
+    """Export the numbers returned by `collect` as gauges named `openbank_<name>_<key>`."""
+    _collectors[name] = collect
+
+def current_request_stats() -> RequestStats | None:
+    return _current.get()
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        global in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        in_flight += 1
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f'app;dur={total_ms:.1f}, '
+                                                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            in_flight -= 1
+            _current.reset(token)
+            # Route templates keep the label set bounded, unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            key = (scope["method"], route)
+            with _lock:
+                _latency.setdefault(key, Histogram()).observe(time.perf_counter() - started)
+                _responses[key + (status,)] = _responses.get(key + (status,), 0) + 1
+                _route_queries[key] = _route_queries.get(key, 0) + stats.queries
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        f"# HELP {PREFIX}_http_requests_total Responses by route and status code.",
+        f"# TYPE {PREFIX}_http_requests_total counter",
+    ]
+    with _lock:
+        for (method, route, status), count in sorted(_responses.items()):
+            lines.append(f'{PREFIX}_http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+        lines += [
+            f"# HELP {PREFIX}_http_request_duration_seconds Request latency by route.",
+            f"# TYPE {PREFIX}_http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(_latency.items()):
+            lines += histogram.render(f"{PREFIX}_http_request_duration_seconds", f'method="{method}",route="{route}"')
+        lines += [
+            f"# HELP {PREFIX}_http_request_db_queries_total Database queries issued by requests, by route.",
+            f"# TYPE {PREFIX}_http_request_db_queries_total counter",
+        ]
+        for (method, route), count in sorted(_route_queries.items()):
+            lines.append(f'{PREFIX}_http_request_db_queries_total{{method="{method}",route="{route}"}} {count}')
+        lines += [
+            f"# TYPE {PREFIX}_http_requests_in_flight gauge",
+            f"{PREFIX}_http_requests_in_flight {in_flight}",
+            f"# TYPE {PREFIX}_db_queries_total counter",
+            f"{PREFIX}_db_queries_total {db_queries}",
+            f"# TYPE {PREFIX}_db_query_seconds_total counter",
+            f"{PREFIX}_db_query_seconds_total {db_seconds}",
+        ]
+    for name, collect in sorted(_collectors.items()):
+        for key, value in collect().items():
+            lines.append(f"# TYPE {PREFIX}_{name}_{key} gauge")
+            lines.append(f"{PREFIX}_{name}_{key} {float(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,129 @@
+"""Versioned schema migrations for databases created before a model change.
+
+`SQLModel.metadata.create_all` only creates missing tables, so indexes and
+columns added to existing tables are brought in here. Steps run in order and
+must be idempotent, since on a fresh database create_all already did the work.
+Every schema change needs a step, new tables included: with `fast_startup`
+a database at LATEST_VERSION skips create_all altogether.
+"""
+from typing import Callable
+from sqlalchemy import func, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import SQLModel
+from models import SchemaVersion
+import money
+
+
+def create_missing_indexes(conn: Connection):
+    """Create every index declared on the models that the database does not have yet.
+
+    Fails with an IntegrityError if existing rows violate a new unique index,
+    e.g. duplicate usernames, which then have to be resolved by hand.
+    """
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def drop_index(name: str) -> Callable[[Connection], None]:
+    def step(conn: Connection):
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    return step
+
+def run_all(*steps: Callable[[Connection], None]) -> Callable[[Connection], None]:
+    def step(conn: Connection):
+        for each in steps:
+            each(conn)
+    return step
+
+def add_column(table: str, column: str, ddl: str) -> Callable[[Connection], None]:
+    def step(conn: Connection):
+        if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return step
+
+def drop_column(table: str, column: str) -> Callable[[Connection], None]:
+    def step(conn: Connection):
+        if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+    return step
+
+def create_missing_tables(conn: Connection):
+    SQLModel.metadata.create_all(conn)
+
+def amounts_to_minor_units(table: str, columns: dict[str, str], currency: str = "currency") -> Callable[[Connection], None]:
+    """Move NUMERIC amount columns into integer minor-unit columns (old name -> new name) and drop them.
+
+    `currency` is the SQL expression giving a row's currency, whose exponent scales its amounts.
+    """
+    def step(conn: Connection):
+        existing = {c["name"] for c in inspect(conn).get_columns(table)}
+        if not existing & columns.keys():
+            return
+        for new in columns.values():
+            if new not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {new} BIGINT NOT NULL DEFAULT 0")
+        # ROUND first: SQLite keeps NUMERIC values as floats, 0.29 * 100 is 28.999...
+        assignments = ", ".join(f"{new} = CAST(ROUND({old} * :factor) AS BIGINT)" for old, new in columns.items())
+        for code in conn.execute(text(f"SELECT DISTINCT {currency} FROM {table}")).scalars().all():
+            conn.execute(
+                text(f"UPDATE {table} SET {assignments} WHERE {currency} = :currency"),
+                {"factor": 10 ** money.exponent(code), "currency": code},
+            )
+        for old in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {old}")
+    return step
+
+def widen_password_column(conn: Connection):
+    # SQLite does not enforce VARCHAR lengths, other backends need the room for hashes
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("ALTER TABLE customer ALTER COLUMN password TYPE VARCHAR(255)")
+    elif conn.dialect.name == "mysql":
+        conn.exec_driver_sql("ALTER TABLE customer MODIFY password VARCHAR(255) NOT NULL")
+
+
+# (version, description, step); append only, never renumber
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Indexes on customer.username, account.iban and account.customer_id", create_missing_indexes),
+    (2, "Replace account.customer_id index with (customer_id, created_at, id)",
+     run_all(create_missing_indexes, drop_index("ix_account_customer_id"))),
+    (3, "Widen customer.password to hold scrypt hashes", widen_password_column),
+    (4, "Add customer.accounts_version for overview ETags",
+     add_column("customer", "accounts_version", "INTEGER NOT NULL DEFAULT 0")),
+    (5, "Tables for idempotency keys, transfers, the ledger and FX rates", create_missing_tables),
+    (6, "Store account balances as integer minor units",
+     amounts_to_minor_units("account", {"balance": "balance_minor"})),
+    (7, "Store transfer and ledger amounts as integer minor units",
+     run_all(amounts_to_minor_units("transfer", {"amount": "amount_minor"}),
+             amounts_to_minor_units("ledgerentry", {"amount": "amount_minor", "balance_after": "balance_after_minor"},
+                                    currency="(SELECT currency FROM transfer WHERE transfer.id = ledgerentry.transfer_id)"))),
+    (8, "Drop customer.accounts_version, overview ETags come from the account data",
+     drop_column("customer", "accounts_version")),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(conn: Connection) -> int:
+    return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+def schema_is_current(engine: Engine) -> bool:
+    """Whether the database has every migration applied; False as well before the first one."""
+    try:
+        with engine.connect() as conn:
+            return current_version(conn) == LATEST_VERSION
+    except DBAPIError:
+        return False
+
+def migrate(engine: Engine) -> list[int]:
+    """Apply pending migrations in one transaction and return the versions applied."""
+    applied = []
+    with engine.begin() as conn:
+        version = current_version(conn)
+        for number, description, step in MIGRATIONS:
+            if number <= version:
+                continue
+            step(conn)
+            conn.execute(insert(SchemaVersion).values(version=number, description=description))
+            applied.append(number)
+    return applied
@@ -1,5 +1,11 @@
 from .customer import Customer, CustomerBase
-from .account import Account, AccountType, AccountBase
+from .account import Account, AccountType, AccountCore, AccountBase
 from .allowed_country import AllowedCountry
+from .schema_version import SchemaVersion
+from .sequence import Sequence
+from .idempotency_key import IdempotencyKey
+from .transfer import Transfer, LedgerEntry
+from .fx_rate import FxRate
 
-__all__ = ["Customer", "CustomerBase", "Account", "AccountType", "AccountBase", "AllowedCountry"]
\ No newline at end of file
+__all__ = ["Customer", "CustomerBase", "Account", "AccountType", "AccountCore", "AccountBase", "AllowedCountry", "SchemaVersion",
+           "Sequence", "IdempotencyKey", "Transfer", "LedgerEntry", "FxRate"]
\ No newline at end of file
@@ -2,8 +2,10 @@ from datetime import datetime, timezone
 from decimal import Decimal
 from enum import Enum
 from uuid import UUID, uuid4
-from pydantic import field_validator
+from pydantic import ValidationInfo, field_validator
+from sqlalchemy import BigInteger, Index
 from sqlmodel import SQLModel, Field, Relationship
+import money
 
 
 class AccountType(str, Enum):
@@ -12,22 +14,35 @@ class AccountType(str, Enum):
     saving = "saving"
     investment = "investment"
 
-# Shared account properties
-class AccountBase(SQLModel):
-    iban : str = Field(..., description="International Bank Account Number (IBAN)")
+# Account properties stored as they are shown
+class AccountCore(SQLModel):
+    iban : str = Field(..., unique=True, index=True, description="International Bank Account Number (IBAN)")
     account_type: AccountType = Field(AccountType.checking)
-    balance: Decimal = Field(default=Decimal("0.00"), description="Account balance, stored with 2 decimal places")
     currency: str = Field("EUR", description="Currency code (ISO 4217)")
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Shared account properties, with the balance as a decimal amount
+class AccountBase(AccountCore):
+    balance: Decimal = Field(default=Decimal("0.00"),
+                             description="Account balance, rounded to the currency's minor unit (2 decimal places for most)")
+
     @field_validator("balance")
-    def validate_balance(cls, v: Decimal) -> Decimal:
+    def validate_balance(cls, v: Decimal, info: ValidationInfo) -> Decimal:
         if v < 0:
             raise ValueError("Balance cannot be negative")
-        return v.quantize(Decimal("0.01"))
+        return money.quantize(v, info.data.get("currency", "EUR"))
 
 # account table
-class Account(AccountBase, table=True):
+class Account(AccountCore, table=True):
+    # Serves the per-customer lookups and the keyset pagination of the overview
+    __table_args__ = (Index("ix_account_customer_id_created_at_id", "customer_id", "created_at", "id"),)
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
+    # Integer minor units (cents for EUR): sums and comparisons stay integer arithmetic on every backend
+    balance_minor: int = Field(default=0, sa_type=BigInteger)
     customer_id: UUID = Field(foreign_key="customer.id")
-    customer: "Customer" = Relationship(back_populates="accounts")
\ No newline at end of file
+    customer: "Customer" = Relationship(back_populates="accounts")
+
+    @property
+    def balance(self) -> Decimal:
+        return money.from_minor(self.balance_minor, self.currency)
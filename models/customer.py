@@ -9,11 +9,12 @@ class CustomerBase(SQLModel):
     address: str = Field(..., description="Residential address")
     country: str = Field(..., min_length=2, max_length=2, description="2-letter ISO country code of residence. Must be one of the allowed countries (NL, BE, DE)")
     id_document: str = Field(..., description="Government-issued ID number, e.g., passport number")
-    username: str = Field(..., min_length=3, max_length=20, description="Unique username for login (3~20 characters)")
+    username: str = Field(..., min_length=3, max_length=20, unique=True, index=True,
+                          description="Unique username for login (3~20 characters)")
 
 # customer table
 class Customer(CustomerBase, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    password: str = Field(..., min_length=8, max_length=12)
+    password: str = Field(..., min_length=8, max_length=255, description="scrypt hash of the password, see passwords.py")
     accounts: list["Account"] = Relationship(back_populates="customer")
     registered_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
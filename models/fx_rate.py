@@ -0,0 +1,10 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy import Numeric
+from sqlmodel import SQLModel, Field
+
+# fxrate table: what one unit of each currency is worth in EUR, for converted totals
+class FxRate(SQLModel, table=True):
+    currency: str = Field(primary_key=True, min_length=3, max_length=3, description="Currency code (ISO 4217)")
+    eur_rate: Decimal = Field(sa_type=Numeric(18, 8), gt=0, description="Value of one unit in EUR")
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
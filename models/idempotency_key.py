@@ -0,0 +1,11 @@
+from datetime import datetime
+from sqlalchemy import Text
+from sqlmodel import SQLModel, Field
+
+# idempotencykey table: one row per Idempotency-Key seen by a write route, see idempotency.py
+class IdempotencyKey(SQLModel, table=True):
+    key: str = Field(primary_key=True, max_length=320, description="Route scope and client key, e.g. 'register:<key>'")
+    fingerprint: str = Field(max_length=64, description="sha256 of the request body the key was first used with")
+    status_code: int | None = Field(default=None, description="Null while the first request is still running")
+    response_body: str | None = Field(default=None, sa_type=Text)
+    expires_at: datetime = Field(index=True)
@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field
+
+# schema_version table, one row per applied migration
+class SchemaVersion(SQLModel, table=True):
+    version: int = Field(primary_key=True)
+    description: str
+    applied_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,7 @@
+from sqlalchemy import BigInteger
+from sqlmodel import SQLModel, Field
+
+# sequence table: named counters handed out in blocks, unique across workers and restarts
+class Sequence(SQLModel, table=True):
+    name: str = Field(primary_key=True, description="What the counter numbers, e.g. 'iban'")
+    next_value: int = Field(default=0, sa_type=BigInteger, description="First value not handed out yet")
@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import UUID, uuid4
+from sqlalchemy import BigInteger, Index
+from sqlmodel import SQLModel, Field, Relationship
+import money
+
+# transfer table: one row per money movement between two accounts
+class Transfer(SQLModel, table=True):
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    source_account_id: UUID = Field(foreign_key="account.id")
+    target_account_id: UUID = Field(foreign_key="account.id")
+    # Integer minor units of `currency`, like Account.balance_minor
+    amount_minor: int = Field(sa_type=BigInteger, description="Always positive")
+    currency: str
+    reference: str | None = Field(default=None, max_length=140)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    entries: list["LedgerEntry"] = Relationship(back_populates="transfer")
+
+    @property
+    def amount(self) -> Decimal:
+        return money.from_minor(self.amount_minor, self.currency)
+
+# ledgerentry table: append-only, one row per account a transfer touched; never updated or deleted
+class LedgerEntry(SQLModel, table=True):
+    # Serves an account's statement in posting order
+    __table_args__ = (Index("ix_ledgerentry_account_id_id", "account_id", "id"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    account_id: UUID = Field(foreign_key="account.id")
+    transfer_id: UUID = Field(foreign_key="transfer.id")
+    # Integer minor units of the transfer's currency
+    amount_minor: int = Field(sa_type=BigInteger, description="Negative for debits, positive for credits")
+    balance_after_minor: int = Field(sa_type=BigInteger)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    transfer: Transfer = Relationship(back_populates="entries")
@@ -0,0 +1,32 @@
+"""Amounts as integers in a currency's minor units (cents for EUR, yen for JPY, fils for KWD).
+
+Balances, transfer amounts and ledger entries are stored and summed as integers; Decimals only appear at the API
+boundary, converted with the currency's ISO 4217 exponent.
+"""
+from decimal import Decimal
+
+# ISO 4217 currencies whose minor unit is not a hundredth
+MINOR_UNIT_EXPONENTS = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0, "PYG": 0,
+    "RWF": 0, "UGX": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+}
+DEFAULT_EXPONENT = 2
+
+
+def exponent(currency: str) -> int:
+    return MINOR_UNIT_EXPONENTS.get(currency, DEFAULT_EXPONENT)
+
+def quantize(amount: Decimal, currency: str) -> Decimal:
+    """Round `amount` to the currency's minor unit."""
+    return amount.quantize(Decimal(1).scaleb(-exponent(currency)))
+
+def to_minor(amount: Decimal, currency: str) -> int:
+    """`amount` in minor units. Raises ValueError when it is finer than the currency's minor unit."""
+    units = amount.scaleb(exponent(currency))
+    if units != units.to_integral_value():
+        raise ValueError(f"{currency} amounts have at most {exponent(currency)} decimal places")
+    return int(units)
+
+def from_minor(units: int, currency: str) -> Decimal:
+    return Decimal(units).scaleb(-exponent(currency))
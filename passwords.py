@@ -0,0 +1,121 @@
+"""Password hashing with scrypt, run off the event loop.
+
+Hashes are stored as `scrypt$n$r$p$salt$hash` (salt and hash base64), so the
+cost can be raised later: `needs_rehash` flags hashes made with other
+parameters and logon upgrades them. Stored values without the scheme prefix
+are legacy plaintext passwords; they are compared in constant time and
+likewise upgraded on the next successful logon.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from config import settings
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode()
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem must cover the 128 * n * r bytes scrypt needs, plus some slack
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=KEY_BYTES,
+                          maxmem=128 * n * r * 2 + 1024 * 1024)
+
+def hash_password(password: str) -> str:
+    n, r, p = settings.password_hash_n, settings.password_hash_r, settings.password_hash_p
+    salt = os.urandom(SALT_BYTES)
+    return f"{SCHEME}${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+def verify_password(password: str, stored: str) -> bool:
+    if not stored.startswith(f"{SCHEME}$"):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    _, n, r, p, salt, expected = stored.split("$")
+    actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(actual, base64.b64decode(expected))
+
+def needs_rehash(stored: str) -> bool:
+    current = f"{SCHEME}${settings.password_hash_n}${settings.password_hash_r}${settings.password_hash_p}$"
+    return not stored.startswith(current)
+
+
+class PasswordHasher:
+    """Bounded thread pool for hashing; hashlib.scrypt releases the GIL while it works.
+
+    At most `workers` hashes run at once. Once `max_pending` calls are
+    running or queued, new ones are rejected with a 503 instead of piling up.
+    """
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Too many concurrent password checks, retry later",
+                                    headers={"Retry-After": "1"})
+            self.pending += 1
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.calls += 1
+                    self.queue_seconds += started - submitted
+                    self.max_queue_seconds = max(self.max_queue_seconds, started - submitted)
+                    self.hash_seconds += finished - started
+
+        try:
+            return await asyncio.wrap_future(self._executor.submit(job))
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "pending": self.pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "queue_seconds_total": self.queue_seconds,
+            "queue_seconds_max": self.max_queue_seconds,
+            "hash_seconds_total": self.hash_seconds,
+        }
+
+
+hasher = PasswordHasher(workers=settings.password_hash_workers, max_pending=settings.password_hash_max_pending)
+_dummy_hash: str | None = None
+
+async def hash_password_async(password: str) -> str:
+    return await hasher.run(hash_password, password)
+
+async def verify_password_async(password: str, stored: str | None) -> bool:
+    """Verify on the pool. With no stored hash (unknown user) a dummy hash is checked,
+    so the response time does not reveal whether the username exists."""
+    global _dummy_hash
+    if stored is None:
+        if _dummy_hash is None:
+            # Made on the pool too; concurrent first misses may each make one, any of them will do
+            _dummy_hash = await hash_password_async(os.urandom(SALT_BYTES).hex())
+        await hasher.run(verify_password, password, _dummy_hash)
+        return False
+    return await hasher.run(verify_password, password, stored)
@@ -0,0 +1,111 @@
+"""Token-bucket rate limiting for the credential endpoints.
+
+Limits are FastAPI dependencies, so excess requests are rejected before the
+route touches the database or the password hasher. Buckets live in a
+RateLimitBackend: MemoryBackend keeps them per process in an LRU-bounded
+dict; a shared store can be plugged in by assigning `ratelimit.backend`.
+Behind a proxy, run uvicorn with --proxy-headers so the client IP is real.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Protocol
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from config import settings
+
+
+class RateLimitBackend(Protocol):
+    def hit(self, key: str, rate: float, burst: int) -> float:
+        """Take a token from the bucket `key`, refilled at `rate` tokens per second up to `burst`.
+
+        Returns 0 when the request is allowed, otherwise the seconds until it would be.
+        """
+        ...
+
+    def reset(self):
+        ...
+
+
+class MemoryBackend:
+    """In-process buckets; O(1) per hit, least recently used buckets evicted beyond `max_keys`.
+
+    An evicted bucket comes back full, which at worst lets an idle client burst again.
+    """
+    def __init__(self, max_keys: int, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def hit(self, key: str, rate: float, burst: int) -> float:
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> dict[str, float]:
+        return {"keys": len(self._buckets), "max_keys": self.max_keys, "evictions": self.evictions}
+
+
+backend: RateLimitBackend = MemoryBackend(max_keys=settings.rate_limit_max_keys)
+
+
+class RateLimit:
+    """`per_minute` requests per key on average, with bursts of up to `burst`."""
+    def __init__(self, scope: str, per_minute: int, burst: int):
+        self.scope = scope
+        self.per_minute = per_minute
+        self.burst = burst
+        self.rejected = 0
+
+    def check(self, key: str):
+        if not settings.rate_limit_enabled:
+            return
+        retry_after = backend.hit(f"{self.scope}:{key}", self.per_minute / 60, self.burst)
+        if retry_after:
+            self.rejected += 1
+            raise HTTPException(status_code=429, detail="Too many requests, retry later",
+                                headers={"Retry-After": str(math.ceil(retry_after))})
+
+
+logon_ip_limit = RateLimit("logon-ip", settings.logon_ip_rate_per_minute, settings.logon_ip_burst)
+logon_username_limit = RateLimit("logon-username", settings.logon_username_rate_per_minute,
+                                 settings.logon_username_burst)
+register_ip_limit = RateLimit("register-ip", settings.register_ip_rate_per_minute, settings.register_ip_burst)
+username_check_ip_limit = RateLimit("username-check-ip", settings.username_check_ip_rate_per_minute,
+                                    settings.username_check_ip_burst)
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+async def limit_logon(request: Request, credential: OAuth2PasswordRequestForm = Depends()):
+    logon_ip_limit.check(client_ip(request))
+    logon_username_limit.check(credential.username.lower())
+
+async def limit_register(request: Request):
+    register_ip_limit.check(client_ip(request))
+
+async def limit_username_check(request: Request):
+    username_check_ip_limit.check(client_ip(request))
+
+def stats() -> dict[str, float]:
+    rejected = {f"{limit.scope}_rejected": limit.rejected
+                for limit in [logon_ip_limit, logon_username_limit, register_ip_limit, username_check_ip_limit]}
+    return rejected | (backend.stats() if hasattr(backend, "stats") else {})
@@ -0,0 +1,27 @@
+"""Opt-in fast path for responses built from trusted ORM data.
+
+By default a route's return value is validated into its response model and
+then validated again by FastAPI against `response_model` before being
+serialized, so every Decimal and datetime of every account is walked
+repeatedly. With `fast_responses` enabled, routes copy the response model's
+fields off the ORM objects into plain dicts and pydantic-core serializes
+them straight to JSON bytes, with the same encoding the models would use.
+FastAPI passes the ready Response through untouched.
+"""
+from typing import Any
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+def fields_of(model: type[BaseModel], obj: Any) -> dict[str, Any]:
+    """The fields of `model`, read from `obj` without validating them.
+
+    Loaded ORM attributes are read straight from the instance dict; going
+    through the instrumented descriptors costs more than serializing them.
+    """
+    loaded = obj.__dict__
+    return {name: loaded[name] if name in loaded else getattr(obj, name) for name in model.model_fields}
+
+def json_response(content: Any, status_code: int = 200, headers: dict[str, str] | None = None) -> Response:
+    return Response(content=to_json(content), status_code=status_code, headers=headers, media_type="application/json")
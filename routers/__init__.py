@@ -1,5 +1,6 @@
 from .customer import router as customer_router
 from .auth import router as auth_router
 from .account import router as account_router
+from .transfer import router as transfer_router
 
-__all__ = ["customer_router", "auth_router", "account_router"]
\ No newline at end of file
+__all__ = ["customer_router", "auth_router", "account_router", "transfer_router"]
\ No newline at end of file
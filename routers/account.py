@@ -1,14 +1,39 @@
-from fastapi import Depends, Body, APIRouter, HTTPException
-from sqlmodel import Session
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Literal
+from uuid import uuid4
+from fastapi import Depends, Body, APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import AwareDatetime
+from pydantic_core import to_json
+from sqlalchemy import and_, case, func, insert, or_
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 from auth import get_current_customer
-from db import get_session
-from models import Customer, Account
-from schemas import AccountRequest, AccountPublic, AccountsResponse
-from utils import generate_iban
+from db import async_read_session, get_async_session, get_async_read_session
+from models import Customer, Account, AccountType, LedgerEntry, Transfer
+from responses import fields_of, json_response
+from schemas import AccountRequest, AccountPublic, AccountsResponse, BalanceGroup, BalanceSummary, CurrencyBalance
+from config import settings
+from fx import fx_rates
+from iban import generate_ibans_async
+import idempotency
+import money
+from utils import encode_cursor, decode_cursor, etag_matches, make_etag
 
 router = APIRouter(prefix="/accounts", tags=["Account"])
 
+# Accounts per /open/batch request; keeps the multi-row insert within every backend's parameter limit
+MAX_BATCH_ACCOUNTS = 100
+
+# Ledger rows fetched per round trip by the export; memory use is bounded by this, not the history size
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FIELDS = ["id", "created_at", "amount", "balance_after", "counterparty_iban", "reference", "transfer_id"]
+
+
 @router.post(
     "/open",
     response_model=AccountPublic,
@@ -17,42 +42,308 @@ router = APIRouter(prefix="/accounts", tags=["Account"])
         201: {"description": "Account created successfully"},
         401: {"description": "Invalid or expired token"},
         404: {"description": "Customer not found"},
+        409: {"description": "A request with this Idempotency-Key is in progress"},
+        422: {"description": "Idempotency-Key was used with a different request"},
     }
 )
 async def open_account(
     customer: Customer = Depends(get_current_customer),
     account_request: AccountRequest = Body(...),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: str | None = Header(None, max_length=255, description="Retries with the same key open one account"),
 ) -> AccountPublic:
-    account = Account(
-        iban=generate_iban(),
-        account_type=account_request.account_type,
-        currency=account_request.currency,
-    )
-    customer.accounts.append(account)
-    session.add(account)
-    session.commit()
-    session.refresh(account)
+    async with idempotency.store.guard(f"open:{customer.id}", idempotency_key, account_request) as slot:
+        if slot.replay is not None:
+            return slot.replay
+
+        # Link by id: lazy-loading customer.accounts is not possible on an AsyncSession
+        iban, = await generate_ibans_async(1)
+        account = Account(
+            iban=iban,
+            account_type=account_request.account_type,
+            currency=account_request.currency,
+            customer_id=customer.id,
+        )
+        session.add(account)
+        await session.commit()
+        await session.refresh(account)
+
+        if settings.fast_responses:
+            content = json_response(fields_of(AccountPublic, account), status_code=status.HTTP_201_CREATED)
+        else:
+            content = AccountPublic.model_validate(account)
+        return slot.respond(content, status.HTTP_201_CREATED)
+
 
-    return account
+@router.post(
+    "/open/batch",
+    description="Open several accounts at once: one IBAN reservation, one multi-row insert and one commit.",
+    response_model=list[AccountPublic],
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        201: {"description": "Accounts created successfully, in request order"},
+        401: {"description": "Invalid or expired token"},
+        409: {"description": "A request with this Idempotency-Key is in progress"},
+        422: {"description": "Invalid request, or Idempotency-Key reused for another request"},
+    }
+)
+async def open_accounts(
+    customer: Customer = Depends(get_current_customer),
+    account_requests: list[AccountRequest] = Body(..., min_length=1, max_length=MAX_BATCH_ACCOUNTS),
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: str | None = Header(None, max_length=255, description="Retries with the same key open one batch"),
+) -> list[AccountPublic]:
+    async with idempotency.store.guard(f"open-batch:{customer.id}", idempotency_key, account_requests) as slot:
+        if slot.replay is not None:
+            return slot.replay
+
+        ibans = await generate_ibans_async(len(account_requests))
+        created_at = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": uuid4(),
+                "iban": iban,
+                "account_type": account_request.account_type,
+                "balance_minor": 0,
+                "currency": account_request.currency,
+                "created_at": created_at,
+                "customer_id": customer.id,
+            }
+            for iban, account_request in zip(ibans, account_requests)
+        ]
+        # The response is built from the rows themselves, nothing is read back
+        await session.exec(insert(Account).values(rows))
+        await session.commit()
+
+        public = [
+            {name: row[name] if name != "balance" else money.from_minor(0, row["currency"])
+             for name in AccountPublic.model_fields}
+            for row in rows
+        ]
+        if settings.fast_responses:
+            content = json_response(public, status_code=status.HTTP_201_CREATED)
+        else:
+            content = [AccountPublic.model_construct(**fields) for fields in public]
+        return slot.respond(content, status.HTTP_201_CREATED)
 
 
 @router.get(
     "/overview",
-    description="List all accounts owned by the customer.",
+    description="List the accounts owned by the customer, oldest first, one page at a time.",
     tags=["Account"],
     response_model=AccountsResponse,
-    response_description="A list of accounts with IBAN, type, balance, currency, and creation timestamp",
+    response_description="A page of accounts with IBAN, type, balance, currency, and creation timestamp",
     responses={
         200: {"description": "Accounts retrieved successfully"},
+        304: {"description": "Accounts unchanged since the `If-None-Match` ETag"},
+        400: {"description": "Invalid cursor"},
         401: {"description": "Invalid or expired token"},
         404: {"description": "No accounts found for the customer"},
     }
 )
-async def overview(customer: Customer = Depends(get_current_customer)) -> AccountsResponse:
-    # Find the account
-    accounts = customer.accounts
-    if not accounts:
+async def overview(
+    response: Response,
+    customer: Customer = Depends(get_current_customer),
+    session: AsyncSession = Depends(get_async_read_session),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of accounts to return"),
+    cursor: str | None = Query(None, description="`next_cursor` of the previous page"),
+    account_type: AccountType | None = Query(None, description="Only accounts of this type"),
+    currency: str | None = Query(None, min_length=3, max_length=3, description="Only accounts in this currency"),
+    if_none_match: str | None = Header(None),
+) -> AccountsResponse:
+    # Keyset pagination over (created_at, id), served by the (customer_id, created_at, id) index
+    statement = select(Account).where(Account.customer_id == customer.id)
+    if account_type is not None:
+        statement = statement.where(Account.account_type == account_type)
+    if currency is not None:
+        statement = statement.where(Account.currency == currency)
+    if cursor is not None:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(or_(
+            Account.created_at > created_at,
+            and_(Account.created_at == created_at, Account.id > last_id),
+        ))
+    statement = statement.order_by(Account.created_at, Account.id).limit(limit + 1)
+
+    # Find the accounts, one extra row tells whether another page follows
+    accounts = (await session.exec(statement)).all()
+    if not accounts and cursor is None:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    # The ETag is derived from what the page shows: its accounts with their balances, and whether
+    # another page follows. A revalidation still runs the query, but skips building the body, and
+    # nothing has to be written elsewhere when an account or a balance changes.
+    etag = make_etag(customer.id, limit, cursor, account_type, currency,
+                     *((account.id, account.balance_minor) for account in accounts))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    next_cursor = None
+    if len(accounts) > limit:
+        accounts = accounts[:limit]
+        next_cursor = encode_cursor(accounts[-1].created_at, accounts[-1].id)
+
+    if settings.fast_responses:
+        return json_response({
+            "message": "Accounts retrieved successfully",
+            "accounts": [fields_of(AccountPublic, account) for account in accounts],
+            "next_cursor": next_cursor,
+        }, headers=headers)
+    response.headers.update(headers)
+    return AccountsResponse(message="Accounts retrieved successfully", accounts=accounts, next_cursor=next_cursor)
+
+
+@router.get(
+    "/summary",
+    description="Balances per currency and account type, optionally totalled in one currency at the current FX rates.",
+    tags=["Account"],
+    response_model=BalanceSummary,
+    responses={
+        200: {"description": "Balance summary"},
+        401: {"description": "Invalid or expired token"},
+        422: {"description": "No FX rate for the requested or an account's currency"},
+    }
+)
+async def summary(
+    customer: Customer = Depends(get_current_customer),
+    session: AsyncSession = Depends(get_async_read_session),
+    currency: str | None = Query(None, min_length=3, max_length=3, description="Also total all balances in this currency"),
+) -> BalanceSummary:
+    # Aggregated by the database as integer sums, only one row per (currency, account type) comes back
+    statement = (
+        select(Account.currency, Account.account_type, func.count(), func.sum(Account.balance_minor))
+        .where(Account.customer_id == customer.id)
+        .group_by(Account.currency, Account.account_type)
+        .order_by(Account.currency, Account.account_type)
+    )
+    rows = (await session.exec(statement)).all()
+    groups = [
+        BalanceGroup(currency=code, account_type=account_type, accounts=accounts,
+                     balance=money.from_minor(balance_minor, code))
+        for code, account_type, accounts, balance_minor in rows
+    ]
+
+    totals: dict[str, tuple[int, int]] = {}
+    for code, _, accounts, balance_minor in rows:
+        count, units = totals.get(code, (0, 0))
+        totals[code] = (count + accounts, units + balance_minor)
+    currencies = [
+        CurrencyBalance(currency=code, accounts=count, balance=money.from_minor(units, code))
+        for code, (count, units) in totals.items()
+    ]
+
+    total = None
+    if currency is not None:
+        # FX rates are keyed by upper-case ISO 4217 codes
+        currency = currency.upper()
+        try:
+            converted = await fx_rates.convert({c.currency: c.balance for c in currencies}, currency)
+        except KeyError as e:
+            raise HTTPException(status_code=422, detail=f"No FX rate for {e.args[0]}")
+        total = CurrencyBalance(currency=currency, accounts=sum(g.accounts for g in groups), balance=converted)
+
+    return BalanceSummary(groups=groups, currencies=currencies, total=total)
+
+
+@router.get(
+    "/{iban}/entries",
+    description="Stream the ledger entries of one of the customer's accounts, oldest first, as NDJSON or CSV.",
+    tags=["Account"],
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "One entry per line", "content": {"application/x-ndjson": {}, "text/csv": {}}},
+        401: {"description": "Invalid or expired token"},
+        404: {"description": "Account not found"},
+    }
+)
+async def export_entries(
+    iban: str,
+    customer: Customer = Depends(get_current_customer),
+    session: AsyncSession = Depends(get_async_read_session),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    start: AwareDatetime | None = Query(None, description="Only entries booked at or after this time"),
+    end: AwareDatetime | None = Query(None, description="Only entries booked before this time"),
+    after: int | None = Query(None, ge=0, description="`id` of the last entry received, to resume an export"),
+) -> StreamingResponse:
+    account_id = (await session.exec(
+        select(Account.id).where(Account.iban == iban, Account.customer_id == customer.id)
+    )).first()
+    if account_id is None:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    return AccountsResponse(message="Accounts retrieved successfully", accounts=accounts)
\ No newline at end of file
+    counterparty = aliased(Account)
+    statement = (
+        select(
+            LedgerEntry.id,
+            LedgerEntry.created_at,
+            LedgerEntry.amount_minor,
+            LedgerEntry.balance_after_minor,
+            Transfer.currency,
+            counterparty.iban.label("counterparty_iban"),
+            Transfer.reference,
+            LedgerEntry.transfer_id,
+        )
+        .join(Transfer, Transfer.id == LedgerEntry.transfer_id)
+        .join(counterparty, counterparty.id == case(
+            (Transfer.source_account_id == account_id, Transfer.target_account_id),
+            else_=Transfer.source_account_id,
+        ))
+        .where(LedgerEntry.account_id == account_id)
+    )
+    # created_at is stored in UTC, without an offset on SQLite: bounds given with any offset are compared in UTC
+    if start is not None:
+        statement = statement.where(LedgerEntry.created_at >= start.astimezone(timezone.utc))
+    if end is not None:
+        statement = statement.where(LedgerEntry.created_at < end.astimezone(timezone.utc))
+    if after is not None:
+        statement = statement.where(LedgerEntry.id > after)
+    # Served by the (account_id, id) index; yield_per fetches through a server-side cursor where the driver has one
+    statement = statement.order_by(LedgerEntry.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+    render = _render_csv if format == "csv" else _render_ndjson
+
+    async def chunks():
+        # The request's session is closed once the route returns, the stream reads on its own
+        async with async_read_session() as stream_session:
+            result = await stream_session.stream(statement)
+            try:
+                if format == "csv":
+                    yield ",".join(EXPORT_FIELDS) + "\r\n"
+                async for partition in result.partitions():
+                    yield render(partition)
+            finally:
+                await result.close()
+
+    return StreamingResponse(
+        chunks(),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{iban}.{format}"'},
+    )
+
+
+def _entry(row) -> dict:
+    return {
+        "id": row.id,
+        "created_at": row.created_at,
+        "amount": money.from_minor(row.amount_minor, row.currency),
+        "balance_after": money.from_minor(row.balance_after_minor, row.currency),
+        "counterparty_iban": row.counterparty_iban,
+        "reference": row.reference,
+        "transfer_id": row.transfer_id,
+    }
+
+def _render_ndjson(rows) -> bytes:
+    return b"".join(to_json(_entry(row)) + b"\n" for row in rows)
+
+def _render_csv(rows) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for row in rows:
+        entry = _entry(row)
+        writer.writerow([entry["id"], entry["created_at"].isoformat(), entry["amount"], entry["balance_after"],
+                         entry["counterparty_iban"], entry["reference"] or "", entry["transfer_id"]])
+    return out.getvalue()
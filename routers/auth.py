@@ -1,9 +1,15 @@
+import time
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
-from auth import create_access_token
-from db import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from auth import create_access_token, cache_principal
+from config import settings
+from db import get_async_session
 from models import Customer
+from passwords import hash_password_async, needs_rehash, verify_password_async
+from ratelimit import limit_logon
+from responses import json_response
 from schemas import TokenResponse
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -11,26 +17,43 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
     "/logon",
     tags=["Authentication"],
     response_model=TokenResponse,
+    dependencies=[Depends(limit_logon)],
     responses={
         200: {"description": "Successful login returning a JWT token"},
         401: {"description": "Invalid username or password"},
+        429: {"description": "Too many logon attempts from this client or for this username"},
+        503: {"description": "Too many concurrent logons"},
     }
 )
 async def logon(
     credential: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TokenResponse:
     # Find customer with matching username
-    customer = session.exec(
+    customer = (await session.exec(
         select(Customer).where(Customer.username == credential.username)
-    ).first()
+    )).first()
+    # End the read transaction: the connection goes back to the pool instead of waiting for the hasher pool
+    await session.commit()
 
-    if not customer or customer.password != credential.password:
+    if not await verify_password_async(credential.password, customer.password if customer else None):
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
-    token_response = TokenResponse(
+    # Hashed with outdated cost parameters (or stored in plaintext): upgrade while we know the password
+    if needs_rehash(customer.password):
+        customer.password = await hash_password_async(credential.password)
+        session.add(customer)
+        await session.commit()
+
+    # The token is about to be used, warm the principal cache for it
+    cache_principal(customer, expires_at=time.time() + settings.access_token_expire_minutes * 60)
+
+    token_fields = dict(
         message = "Logon successful",
         access_token=create_access_token(username=credential.username),
         token_type="bearer"
     )
+    if settings.fast_responses:
+        return json_response(token_fields)
+    token_response = TokenResponse(**token_fields)
     return token_response
\ No newline at end of file
@@ -1,54 +1,105 @@
-from fastapi import APIRouter, Body, HTTPException, Depends
-from sqlmodel import select, Session
+from fastapi import APIRouter, Body, Header, HTTPException, Depends, Query
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
-from db import get_session
-from models import Customer, AllowedCountry, Account
-from schemas import Credential, CustomerCreate
-from utils import generate_password, generate_iban
+from config import settings
+from db import get_async_session
+from countries import allowed_countries
+from models import Customer, Account
+from schemas import Credential, CustomerCreate, UsernameAvailability
+import groupcommit
+from iban import generate_ibans_async
+import idempotency
+from passwords import hash_password_async
+from ratelimit import limit_register, limit_username_check
+from usernames import usernames
+from utils import generate_password
 
 router = APIRouter(prefix="/customers", tags=["Customer"])
 
+@router.get(
+    "/username-available",
+    description="Check whether a username is still free to register.",
+    response_model=UsernameAvailability,
+    dependencies=[Depends(limit_username_check)],
+    responses={
+        200: {"description": "Whether the username is free"},
+        429: {"description": "Too many checks from this client"},
+    }
+)
+async def username_available(
+    username: str = Query(..., min_length=3, max_length=20),
+) -> UsernameAvailability:
+    return UsernameAvailability(username=username, available=not await usernames.is_taken(username))
+
+
 @router.post(
     "/register",
     description="Onboard a new customer and automatically open their first checking account.",
     response_model=Credential,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_register)],
     responses={
         201: {"description": "Customer registered and account created"},
         403: {"description": "Registration not allowed from this country"},
-        409: {"description": "Username already exists"},
+        409: {"description": "Username already exists, or a request with this Idempotency-Key is in progress"},
+        422: {"description": "Idempotency-Key was used with a different request"},
+        429: {"description": "Too many registrations from this client"},
+        503: {"description": "Too many concurrent registrations"},
     }
 )
 async def register(
     customer_data: CustomerCreate = Body(...),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: str | None = Header(None, max_length=255, description="Retries with the same key register once; a replay returns only the username, not the password"),
 ) -> Credential:
-    # Country check
-    allowed = session.get(AllowedCountry, customer_data.country)
-    if not allowed:
-        raise HTTPException(status_code=403, detail="Registration not allowed from this country")
-
-    # Username check
-    existing = session.exec(select(Customer).where(Customer.username == customer_data.username)).first()
-    if existing:
-        raise HTTPException(status_code=409, detail="Username already exists")
-
-    # Create customer and account
-    password = generate_password()
-    customer = Customer(
-        password=password,
-        **customer_data.model_dump()
-    )
-
-    iban = generate_iban()
-    account = Account(
-        iban=iban,
-    )
-
-    # Link customer and account
-    customer.accounts.append(account)
-
-    session.add(account) # account is being added implicitly
-    session.commit()
-
-    return Credential(username=customer_data.username, password=password)
\ No newline at end of file
+    async with idempotency.store.guard("register", idempotency_key, customer_data) as slot:
+        if slot.replay is not None:
+            return slot.replay
+
+        # Country check, against the in-memory allow-list
+        if not await allowed_countries.is_allowed(customer_data.country):
+            raise HTTPException(status_code=403, detail="Registration not allowed from this country")
+
+        # Retries with a taken username are turned away before the password hash; free ones cost no query.
+        # Before the filter is built, the unique index alone catches them
+        if usernames.loaded and await usernames.is_taken(customer_data.username):
+            raise HTTPException(status_code=409, detail="Username already exists")
+
+        # Create customer and account
+        password = generate_password()
+        customer = Customer(
+            password=await hash_password_async(password),
+            **customer_data.model_dump()
+        )
+
+        iban, = await generate_ibans_async(1)
+        if settings.register_group_commit:
+            # Committed together with concurrent registrations, see groupcommit.py
+            await groupcommit.registrations.submit(customer, Account(iban=iban, customer_id=customer.id))
+        else:
+            account = Account(
+                iban=iban,
+            )
+
+            # Link customer and account
+            customer.accounts.append(account)
+
+            session.add(account) # account is being added implicitly
+
+            # Username check is left to the unique index on customer.username
+            try:
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                # Driver messages differ per database; only a username that now exists makes this a conflict
+                taken = (await session.exec(select(Customer.id).where(Customer.username == customer_data.username))).first()
+                if taken is None:
+                    raise
+                raise HTTPException(status_code=409, detail="Username already exists")
+        usernames.add(customer_data.username)
+
+        # The generated password is only in this response; an Idempotency-Key replay only names the customer
+        return slot.respond(Credential(username=customer_data.username, password=password), status.HTTP_201_CREATED,
+                            replayed={"username": customer_data.username})
\ No newline at end of file
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Body, Depends, Header, HTTPException
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette import status
+from auth import get_current_customer
+from db import get_async_session
+from locks import KeyedLocks
+from models import Account, Customer, LedgerEntry, Transfer
+from schemas import TransferRequest, TransferPublic
+import idempotency
+import money
+
+router = APIRouter(prefix="/transfers", tags=["Transfer"])
+
+# Transfers touching the same account queue here, in memory, instead of on row locks and pool connections
+account_locks = KeyedLocks()
+
+
+@router.post(
+    "",
+    description="Move money from one of the customer's accounts to another account in the same currency.",
+    response_model=TransferPublic,
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        201: {"description": "Transfer booked"},
+        401: {"description": "Invalid or expired token"},
+        404: {"description": "Account not found"},
+        409: {"description": "Insufficient funds, or a request with this Idempotency-Key is in progress"},
+        422: {"description": "Same account, currency mismatch, or Idempotency-Key reused for another request"},
+    }
+)
+async def create_transfer(
+    customer: Customer = Depends(get_current_customer),
+    transfer_request: TransferRequest = Body(...),
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: str | None = Header(None, max_length=255, description="Retries with the same key transfer once"),
+) -> TransferPublic:
+    async with idempotency.store.guard(f"transfer:{customer.id}", idempotency_key, transfer_request) as slot:
+        if slot.replay is not None:
+            return slot.replay
+
+        ibans = [transfer_request.from_iban, transfer_request.to_iban]
+        accounts = {a.iban: a for a in (await session.exec(select(Account).where(Account.iban.in_(ibans)))).all()}
+        source, target = accounts.get(transfer_request.from_iban), accounts.get(transfer_request.to_iban)
+        if source is None or source.customer_id != customer.id:
+            raise HTTPException(status_code=404, detail="Account not found")
+        if target is None:
+            raise HTTPException(status_code=404, detail="Target account not found")
+        if source.id == target.id:
+            raise HTTPException(status_code=422, detail="Cannot transfer to the same account")
+        if source.currency != target.currency:
+            raise HTTPException(status_code=422, detail="Accounts have different currencies")
+
+        try:
+            units = money.to_minor(transfer_request.amount, source.currency)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        async with account_locks.hold(source.id, target.id):
+            # Both rows are updated in id order, so concurrent transfers between the same
+            # two accounts, in either direction and on any worker, cannot deadlock in the database.
+            # The debit only applies while the balance covers it, which keeps balances non-negative.
+            balances = {}
+            for account in sorted([source, target], key=lambda a: a.id):
+                statement = update(Account).where(Account.id == account.id)
+                if account is source:
+                    statement = (statement.where(Account.balance_minor >= units)
+                                 .values(balance_minor=Account.balance_minor - units))
+                else:
+                    statement = statement.values(balance_minor=Account.balance_minor + units)
+                statement = statement.returning(Account.balance_minor).execution_options(synchronize_session=False)
+                balance_minor = (await session.exec(statement)).scalar_one_or_none()
+                if balance_minor is None:
+                    await session.rollback()
+                    raise HTTPException(status_code=409, detail="Insufficient funds")
+                balances[account.id] = balance_minor
+
+            transfer = Transfer(
+                source_account_id=source.id,
+                target_account_id=target.id,
+                amount_minor=units,
+                currency=source.currency,
+                reference=transfer_request.reference,
+            )
+            session.add(transfer)
+            session.add_all([
+                LedgerEntry(account_id=source.id, transfer_id=transfer.id, amount_minor=-units,
+                            balance_after_minor=balances[source.id], created_at=transfer.created_at),
+                LedgerEntry(account_id=target.id, transfer_id=transfer.id, amount_minor=units,
+                            balance_after_minor=balances[target.id], created_at=transfer.created_at),
+            ])
+            content = TransferPublic(
+                id=transfer.id,
+                from_iban=source.iban,
+                to_iban=target.iban,
+                amount=transfer.amount,
+                currency=transfer.currency,
+                reference=transfer.reference,
+                balance_after=money.from_minor(balances[source.id], transfer.currency),
+                created_at=transfer.created_at,
+            )
+            await session.commit()
+
+        return slot.respond(content, status.HTTP_201_CREATED)
@@ -1,5 +1,8 @@
-from .customer import CustomerCreate
-from .account import AccountRequest, AccountPublic, AccountsResponse
+from .customer import CustomerCreate, UsernameAvailability
+from .account import AccountRequest, AccountPublic, AccountsResponse, BalanceGroup, CurrencyBalance, BalanceSummary
 from .auth import TokenResponse, Credential
+from .transfer import TransferRequest, TransferPublic
 
-__all__ = ["CustomerCreate", "AccountRequest", "AccountPublic", "AccountsResponse", "TokenResponse", "Credential"]
\ No newline at end of file
+__all__ = ["CustomerCreate", "UsernameAvailability", "AccountRequest", "AccountPublic", "AccountsResponse", "BalanceGroup", "CurrencyBalance",
+           "BalanceSummary", "TokenResponse", "Credential",
+           "TransferRequest", "TransferPublic"]
\ No newline at end of file
@@ -1,3 +1,4 @@
+from decimal import Decimal
 from pydantic import BaseModel, Field
 from models import AccountType, AccountBase
 
@@ -12,4 +13,20 @@ class AccountPublic(AccountBase):
 
 class AccountsResponse(BaseModel):
     message: str
-    accounts: list[AccountPublic]
\ No newline at end of file
+    accounts: list[AccountPublic]
+    next_cursor: str | None = Field(None, description="Pass as `cursor` to fetch the next page; null on the last page")
+class BalanceGroup(BaseModel):
+    currency: str
+    account_type: AccountType
+    accounts: int
+    balance: Decimal
+
+class CurrencyBalance(BaseModel):
+    currency: str
+    accounts: int
+    balance: Decimal
+
+class BalanceSummary(BaseModel):
+    groups: list[BalanceGroup] = Field(..., description="Balance per currency and account type")
+    currencies: list[CurrencyBalance] = Field(..., description="Balance per currency")
+    total: CurrencyBalance | None = Field(None, description="All balances converted to the requested currency")
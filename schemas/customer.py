@@ -1,5 +1,5 @@
 from datetime import date
-from pydantic import field_validator
+from pydantic import BaseModel, field_validator
 from models import CustomerBase
 
 
@@ -10,4 +10,8 @@ class CustomerCreate(CustomerBase):
         age = (date.today() - v).days // 365
         if age < 18:
             raise ValueError("Customer must be at least 18 years old")
-        return v
\ No newline at end of file
+        return v
+
+class UsernameAvailability(BaseModel):
+    username: str
+    available: bool
@@ -0,0 +1,21 @@
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+from pydantic import BaseModel, Field
+
+
+class TransferRequest(BaseModel):
+    from_iban: str = Field(..., description="IBAN of one of the customer's own accounts, to debit")
+    to_iban: str = Field(..., description="IBAN of the account to credit, in the same currency")
+    amount: Decimal = Field(..., gt=0, max_digits=18, description="At most the currency's decimal places (2 for most)")
+    reference: str | None = Field(None, max_length=140, description="Free text shown on both statements")
+
+class TransferPublic(BaseModel):
+    id: UUID
+    from_iban: str
+    to_iban: str
+    amount: Decimal
+    currency: str
+    reference: str | None
+    balance_after: Decimal = Field(..., description="Balance of the debited account after the transfer")
+    created_at: datetime
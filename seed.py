@@ -1,41 +1,195 @@
+"""Populate the database with fake customers and accounts.
+
+Small runs are handy for manual testing, large ones for load tests:
+
+    uv run python seed.py                                  # 10 customers
+    uv run python seed.py -n 1000000 --workers 8 --seed 42
+
+Faker rows are generated in worker processes, chunk by chunk, and inserted
+by the parent with Core executemany inserts, one transaction per chunk.
+Customers that would violate a unique constraint (a username taken through
+the API, or a re-run with the same --seed and --start) are skipped along with
+their accounts and counted, instead of failing the run partway.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+from multiprocessing import Pool
+from random import Random
+from uuid import UUID
 from faker import Faker
-from sqlmodel import Session
-from db import engine
-from models import Customer, Account
-from utils import generate_iban, generate_password
-from decimal import Decimal
-from random import choice
-
-fake = Faker()
-
-def seed(n: int = 10):
-    with Session(engine) as session:
-        # Create customers
-        for _ in range(n):
-            customer = Customer(
-                name=fake.name(),
-                dob=fake.date_of_birth(minimum_age=18, maximum_age=70),
-                address=fake.address(),
-                country=choice(["NL", "BE", "DE"]),
-                id_document=fake.bothify(text="ID#######"),
-                username=fake.user_name(),
-                password=generate_password()
-            )
-            session.add(customer)
-
-            # Each customer gets 1–2 accounts
-            for _ in range(fake.random_int(min=1, max=2)):
-                account = Account(
-                    iban=generate_iban(),
-                    account_type=choice(["checking", "saving", "investment"]),
-                    currency=choice(["EUR", "GBP", "USD", "CAN", "CNY"]),
-                    balance=Decimal(fake.random_number(digits=4)) / 100
-                )
-                customer.accounts.append(account)
-                session.add(account)
-
-        session.commit()
-        print("Database seeded with sample data")
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from db import engine, init_db
+from models import Customer, Account, AccountType
+from iban import generate_ibans, reserve_numbers
+from passwords import hash_password
+from utils import generate_password
+
+COUNTRIES = ["NL", "BE", "DE"]
+CURRENCIES = ["EUR", "GBP", "USD", "CAD", "CNY"]
+ACCOUNT_TYPES = list(AccountType)
+# Faker values drawn per chunk and then recombined; Faker itself costs ~0.5ms per customer
+FAKER_POOL_SIZE = 500
+# Counter of the sequence table numbering seeded customers, unique across runs
+SEQUENCE_NAME = "seed_customer"
+# Seeded usernames end in this marker and the customer number in hex
+USERNAME_MARKER = "~s"
+
+_fake: Faker | None = None
+
+
+def generate_chunk(args: tuple[int, int, int, int, str]) -> tuple[list[dict], list[dict]]:
+    """Build the customer and account rows for customer numbers [start, start + size).
+
+    Runs in a worker process. Randomness is seeded from (seed, start), so a
+    chunk is reproducible however chunks are spread over the workers.
+    Usernames end in a seeder marker and the customer number, which keeps
+    them apart from each other; IBANs are left for the parent to allocate.
+    """
+    global _fake
+    seed, start, size, max_accounts, password_hash = args
+    if _fake is None:
+        _fake = Faker()
+    fake = _fake
+    fake.seed_instance(f"{seed}:{start}")
+    rng = Random(f"{seed}:{start}")
+    now = datetime.now(timezone.utc)
+
+    pool_size = min(size, FAKER_POOL_SIZE)
+    names = [fake.name() for _ in range(pool_size)]
+    addresses = [fake.address() for _ in range(pool_size)]
+    usernames = [fake.user_name() for _ in range(pool_size)]
+    birth_dates = [fake.date_of_birth(minimum_age=18, maximum_age=70) for _ in range(pool_size)]
+
+    customers, accounts = [], []
+    for number in range(start, start + size):
+        customer_id = UUID(int=rng.getrandbits(128), version=4)
+        suffix = f"{USERNAME_MARKER}{number:x}"
+        customers.append({
+            "id": customer_id,
+            "name": rng.choice(names),
+            "dob": rng.choice(birth_dates),
+            "address": rng.choice(addresses),
+            "country": rng.choice(COUNTRIES),
+            "id_document": f"ID{rng.randrange(10_000_000):07d}",
+            "username": rng.choice(usernames)[:20 - len(suffix)] + suffix,
+            "password": password_hash,
+            "registered_at": now,
+        })
+
+        # Each customer gets 1–max_accounts accounts
+        for _ in range(rng.randint(1, max_accounts)):
+            accounts.append({
+                "id": UUID(int=rng.getrandbits(128), version=4),
+                "customer_id": customer_id,
+                "account_type": rng.choice(ACCOUNT_TYPES),
+                "currency": rng.choice(CURRENCIES),
+                "balance_minor": rng.randrange(10_000),
+                "created_at": now,
+            })
+    return customers, accounts
+
+
+def insert_customers(conn: Connection, customers: list[dict]) -> set[UUID]:
+    """Insert customers, skipping those that conflict with existing rows; returns the ids inserted."""
+    dialect = conn.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        statement = dialect_insert(Customer).on_conflict_do_nothing().returning(Customer.id)
+        return set(conn.execute(statement, customers).scalars().all())
+    taken = set(conn.execute(
+        select(Customer.username).where(Customer.username.in_([c["username"] for c in customers]))
+    ).scalars().all())
+    customers = [c for c in customers if c["username"] not in taken]
+    if customers:
+        conn.execute(insert(Customer), customers)
+    return {c["id"] for c in customers}
+
+
+def seed(
+    n: int = 10,
+    *,
+    max_accounts: int = 2,
+    batch_size: int = 5_000,
+    workers: int = 1,
+    random_seed: int | None = None,
+    start: int | None = None,
+) -> int:
+    """Insert n customers and return the seed used, so the run can be reproduced.
+
+    Hashing a password per customer would dominate the run, so all customers
+    of a run share one password, printed at the start.
+
+    `start` defaults to numbers reserved from the seed_customer counter, so
+    repeated runs never reuse customer numbers, even after deletions.
+    """
+    init_db()
+    if random_seed is None:
+        random_seed = int.from_bytes(os.urandom(4), "big")
+    if start is None:
+        start = reserve_numbers(SEQUENCE_NAME, n).start
+
+    password = generate_password()
+    password_hash = hash_password(password)
+    chunks = [
+        (random_seed, start + offset, min(batch_size, n - offset), max_accounts, password_hash)
+        for offset in range(0, n, batch_size)
+    ]
+    print(f"Seeding {n} customers from #{start} with seed {random_seed} ({len(chunks)} chunks, {workers} workers)")
+    print(f"All customers of this run log on with password {password}")
+
+    began = time.perf_counter()
+    done_customers = done_accounts = skipped = 0
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        rows = pool.imap(generate_chunk, chunks) if pool else map(generate_chunk, chunks)
+        for customers, accounts in rows:
+            # Reserved outside the insert transaction; numbers of skipped customers' accounts go unused
+            for account, iban in zip(accounts, generate_ibans(len(accounts))):
+                account["iban"] = iban
+            with engine.begin() as conn:
+                inserted = insert_customers(conn, customers)
+                accounts = [account for account in accounts if account["customer_id"] in inserted]
+                if accounts:
+                    conn.execute(insert(Account), accounts)
+            done_customers += len(inserted)
+            done_accounts += len(accounts)
+            skipped += len(customers) - len(inserted)
+            elapsed = time.perf_counter() - began
+            print(f"  {done_customers}/{n} customers, {done_accounts} accounts, {skipped} skipped, "
+                  f"{(done_customers + done_accounts) / elapsed:,.0f} rows/s")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    elapsed = time.perf_counter() - began
+    print(f"Database seeded with {done_customers} customers and {done_accounts} accounts in {elapsed:.1f}s"
+          + (f", {skipped} customers skipped as duplicates" if skipped else ""))
+    return random_seed
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Populate the database with fake customers and accounts.")
+    parser.add_argument("-n", "--customers", type=int, default=10, help="number of customers to create")
+    parser.add_argument("--max-accounts", type=int, default=2, help="accounts per customer are drawn from 1..N")
+    parser.add_argument("--batch-size", type=int, default=5_000, help="customers per insert batch and commit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes generating rows")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, to reproduce a previous run")
+    parser.add_argument("--start", type=int, default=None, help="first customer number (default: the next unused one)")
+    args = parser.parse_args(argv)
+    seed(
+        args.customers,
+        max_accounts=args.max_accounts,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        random_seed=args.seed,
+        start=args.start,
+    )
 
 if __name__ == "__main__":
-    seed()
\ No newline at end of file
+    main()
@@ -0,0 +1,29 @@
+"""Timings of the worker's import and startup phases, logged once ready and exported on /metrics."""
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+phases: dict[str, float] = {}
+ddl_skipped = False
+
+
+@contextmanager
+def phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = time.perf_counter() - started
+
+def record(name: str, seconds: float):
+    phases[name] = seconds
+
+def report():
+    timings = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in phases.items())
+    logger.info("Started in %.0fms (%s)%s", sum(phases.values()) * 1000, timings,
+                ", schema DDL skipped" if ddl_skipped else "")
+
+def stats() -> dict[str, float]:
+    return {f"{name}_seconds": seconds for name, seconds in phases.items()} | {"ddl_skipped": int(ddl_skipped)}
@@ -0,0 +1,25 @@
+import pytest
+from config import settings
+from db import init_db, dispose_async_engine
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """ASGITransport does not run the app lifespan, so create the schema once for the whole run."""
+    init_db()
+
+
+@pytest.fixture(autouse=True)
+def rate_limits():
+    """All test requests come from the same client, give every test fresh buckets."""
+    import ratelimit
+    ratelimit.backend.reset()
+
+
+@pytest.fixture
+async def async_mode(monkeypatch):
+    """Run the test against the aiosqlite engine instead of the sync one."""
+    monkeypatch.setattr(settings, "db_async", True)
+    yield
+    # aiosqlite connections are bound to the test's event loop
+    await dispose_async_engine()
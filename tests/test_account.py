@@ -104,4 +104,151 @@ async def test_invalid_token_rejected():
             "/accounts/overview",
             headers={"Authorization": "Bearer faketoken123"}
         )
-        assert resp.status_code == 401
\ No newline at end of file
+        assert resp.status_code == 401
+
+@pytest.mark.asyncio
+async def test_overview_pages_with_cursor_and_filters():
+    """Overview pages through accounts with a cursor and pushes filters into the query."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        headers = {"Authorization": f"Bearer {token}"}
+        for acc_type, currency in [("saving", "EUR"), ("saving", "USD"), ("investment", "USD"), ("saving", "USD")]:
+            await ac.post(
+                "/accounts/open",
+                headers=headers,
+                json={"account_type": acc_type, "currency": currency}
+            )
+
+        ibans, cursor = [], None
+        while True:
+            params = {"limit": 2} | ({"cursor": cursor} if cursor else {})
+            resp = await ac.get("/accounts/overview", headers=headers, params=params)
+            assert resp.status_code == 200
+            page = resp.json()
+            assert len(page["accounts"]) <= 2
+            ibans += [a["iban"] for a in page["accounts"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert len(ibans) == len(set(ibans)) == 5
+
+        resp = await ac.get(
+            "/accounts/overview",
+            headers=headers,
+            params={"account_type": "saving", "currency": "USD"}
+        )
+        accounts = resp.json()["accounts"]
+        assert len(accounts) == 2
+        assert all(a["account_type"] == "saving" and a["currency"] == "USD" for a in accounts)
+
+        resp = await ac.get("/accounts/overview", headers=headers, params={"cursor": "not-a-cursor"})
+        assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_fast_responses_match_validated_responses(monkeypatch):
+    """The opt-in fast serialization path returns the same JSON as the validated one."""
+    from config import settings
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        headers = {"Authorization": f"Bearer {token}"}
+        await ac.post("/accounts/open", headers=headers, json={"account_type": "saving", "currency": "USD"})
+
+        default = await ac.get("/accounts/overview", headers=headers)
+        monkeypatch.setattr(settings, "fast_responses", True)
+        fast = await ac.get("/accounts/overview", headers=headers)
+        opened = await ac.post("/accounts/open", headers=headers, json={"account_type": "investment"})
+
+    assert fast.status_code == 200
+    assert fast.json() == default.json()
+    assert opened.status_code == 201
+    assert set(opened.json()) == {"iban", "account_type", "balance", "currency", "created_at"}
+
+
+@pytest.mark.asyncio
+async def test_overview_etag_revalidation():
+    """A matching If-None-Match gets 304 until the customer opens another account."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        first = await ac.get("/accounts/overview", headers=headers)
+        etag = first.headers["ETag"]
+        assert first.headers["Cache-Control"] == "private, no-cache"
+
+        resp = await ac.get("/accounts/overview", headers={**headers, "If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+        assert resp.content == b""
+
+        # Another page or filter is another representation
+        resp = await ac.get("/accounts/overview", headers={**headers, "If-None-Match": etag}, params={"limit": 1})
+        assert resp.status_code == 200
+
+        await ac.post("/accounts/open", headers=headers, json={"account_type": "saving"})
+        resp = await ac.get("/accounts/overview", headers={**headers, "If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+        assert len(resp.json()["accounts"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_open_accounts_in_one_batch():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        headers = {"Authorization": f"Bearer {token}"}
+        before = await ac.get("/accounts/overview", headers=headers)
+
+        batch = [{"account_type": "saving", "currency": "USD"}, {"account_type": "investment"}]
+        resp = await ac.post("/accounts/open/batch", headers=headers, json=batch)
+        assert resp.status_code == 201
+        opened = resp.json()
+        assert [(a["account_type"], a["currency"]) for a in opened] == [("saving", "USD"), ("investment", "EUR")]
+        assert all(a["balance"] == "0.00" for a in opened)
+
+        overview = await ac.get("/accounts/overview", headers={**headers, "If-None-Match": before.headers["ETag"]})
+        assert overview.status_code == 200
+        assert {a["iban"] for a in opened} <= {a["iban"] for a in overview.json()["accounts"]}
+
+        assert (await ac.post("/accounts/open/batch", headers=headers, json=[])).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_summary_groups_balances_and_converts_total():
+    from sqlalchemy import update
+    from db import get_session
+    from models import Account
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        headers = {"Authorization": f"Bearer {token}"}
+        resp = await ac.post("/accounts/open/batch", headers=headers, json=[
+            {"account_type": "saving", "currency": "EUR"},
+            {"account_type": "saving", "currency": "USD"},
+            {"account_type": "checking", "currency": "USD"},
+        ])
+        balances = {"EUR": 1000, "USD": 550}  # in cents
+        with next(get_session()) as session:
+            for account in resp.json():
+                session.exec(update(Account).where(Account.iban == account["iban"])
+                             .values(balance_minor=balances[account["currency"]]))
+            session.commit()
+
+        resp = await ac.get("/accounts/summary", headers=headers, params={"currency": "EUR"})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert [(g["currency"], g["account_type"], g["accounts"], g["balance"]) for g in data["groups"]] == [
+            ("EUR", "checking", 1, "0.00"), ("EUR", "saving", 1, "10.00"),
+            ("USD", "checking", 1, "5.50"), ("USD", "saving", 1, "5.50"),
+        ]
+        assert {c["currency"]: c["balance"] for c in data["currencies"]} == {"EUR": "10.00", "USD": "11.00"}
+        # With the initial rates, 1 USD is worth 0.92 EUR
+        assert data["total"] == {"currency": "EUR", "accounts": 4, "balance": "20.12"}
+
+        resp = await ac.get("/accounts/summary", headers=headers, params={"currency": "eur"})
+        assert resp.json()["total"] == {"currency": "EUR", "accounts": 4, "balance": "20.12"}
+
+        resp = await ac.get("/accounts/summary", headers=headers)
+        assert resp.json()["total"] is None
+        assert (await ac.get("/accounts/summary", headers=headers, params={"currency": "XXX"})).status_code == 422
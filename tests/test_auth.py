@@ -2,6 +2,7 @@ import pytest
 from httpx import AsyncClient, ASGITransport
 from faker import Faker
 from main import app
+from sqlmodel import select
 from models import Customer
 from db import get_session
 from utils import generate_password
@@ -82,4 +83,108 @@ async def test_logon_nonexistent_user():
         )
 
     assert response.status_code == 401
-    assert response.json()["detail"] == "Invalid username or password"
\ No newline at end of file
+    assert response.json()["detail"] == "Invalid username or password"
+
+@pytest.mark.asyncio
+async def test_authenticated_customer_is_served_from_principal_cache():
+    """Repeat callers skip the customer lookup; updating the customer evicts it."""
+    from auth import principal_cache
+    from tests.test_account import register_and_logon
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        username, token = await register_and_logon(ac)
+        headers = {"Authorization": f"Bearer {token}"}
+        assert principal_cache.get(username) is not None  # warmed by logon
+
+        hits = principal_cache.hits
+        for _ in range(2):
+            resp = await ac.post("/accounts/open", headers=headers, json={"account_type": "saving", "currency": "EUR"})
+            assert resp.status_code == 201
+        assert principal_cache.hits >= hits + 2
+
+        with next(get_session()) as session:
+            customer = session.exec(select(Customer).where(Customer.username == username)).one()
+            customer.address = fake.address()
+            session.add(customer)
+            session.commit()
+        assert principal_cache.get(username) is None
+
+        resp = await ac.get("/accounts/overview", headers=headers)
+        assert resp.status_code == 200
+        assert len(resp.json()["accounts"]) == 3
+
+
+def test_verified_token_is_served_from_token_cache():
+    """A token is verified once and then served from memory until it expires."""
+    from datetime import datetime, timedelta, timezone
+    from fastapi import HTTPException
+    from jose import jwt
+    from auth import create_access_token, decode_access_token, token_cache
+    from config import settings
+
+    token = create_access_token(username=fake.user_name())
+    first = decode_access_token(token)
+    hits = token_cache.hits
+    assert decode_access_token(token) == first
+    assert token_cache.hits == hits + 1
+
+    # Rejected tokens are never cached
+    expired = jwt.encode(
+        {"sub": "someone", "exp": datetime.now(timezone.utc) - timedelta(minutes=1)},
+        settings.secret_key, algorithm=settings.algorithm,
+    )
+    size = len(token_cache)
+    for bad in [expired, token + "x"]:
+        with pytest.raises(HTTPException) as e:
+            decode_access_token(bad)
+        assert e.value.status_code == 401
+    assert len(token_cache) == size
+
+
+@pytest.mark.asyncio
+async def test_logon_upgrades_plaintext_password_to_hash():
+    """A stored plaintext password is replaced by a hash on the first successful logon."""
+    username = fake.user_name()[:20]
+    password = generate_password()
+    with next(get_session()) as session:
+        session.add(Customer(
+            name=fake.name(),
+            dob=fake.date_of_birth(minimum_age=18, maximum_age=70),
+            address=fake.address(),
+            country="NL",
+            id_document=fake.bothify(text="ID#######"),
+            username=username,
+            password=password
+        ))
+        session.commit()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for _ in range(2):
+            response = await ac.post("/auth/logon", data={"username": username, "password": password})
+            assert response.status_code == 200
+
+    with next(get_session()) as session:
+        stored = session.exec(select(Customer.password).where(Customer.username == username)).one()
+    assert stored.startswith("scrypt$")
+
+
+@pytest.mark.asyncio
+async def test_logon_holds_no_connection_while_checking_the_password(monkeypatch):
+    """The scrypt check can queue behind other hashes; a pooled connection must not wait with it."""
+    import db
+    import routers.auth
+    from tests.test_account import register_and_logon
+
+    checked_out = []
+    verify = routers.auth.verify_password_async
+
+    async def recording_verify(password, hashed):
+        checked_out.append(db.get_engine().pool.checkedout())
+        return await verify(password, hashed)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await register_and_logon(ac)
+        monkeypatch.setattr(routers.auth, "verify_password_async", recording_verify)
+        await register_and_logon(ac)
+
+    assert checked_out == [0]
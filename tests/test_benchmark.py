@@ -0,0 +1,43 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from benchmark import compare, percentile, run_benchmark
+from main import app
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+
+
+@pytest.mark.asyncio
+async def test_benchmark_reports_every_endpoint():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        result = await run_benchmark(ac, users=3, concurrency=2, accounts=1, overviews=2)
+
+    endpoints = result["endpoints"]
+    assert set(endpoints) == {"register", "logon", "open_account", "overview"}
+    assert endpoints["overview"]["requests"] == 6
+    assert all(e["errors"] == 0 for e in endpoints.values())
+    assert endpoints["overview"]["queries_per_request"] == 1
+    assert endpoints["overview"]["p50_ms"] <= endpoints["overview"]["p99_ms"]
+
+
+@pytest.mark.asyncio
+async def test_transfer_scenario_books_every_transfer():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        result = await run_benchmark(ac, scenario="transfers", users=4, concurrency=2, transfers=3, hot_accounts=1)
+
+    transfers = result["endpoints"]["transfer"]
+    assert transfers["requests"] == 9  # the first user only provides the hot account
+    assert transfers["errors"] == 0
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    def result(p95, rps):
+        return {"endpoints": {"overview": {"p95_ms": p95, "throughput_rps": rps, "errors": 0}}}
+
+    assert compare(result(11, 95), result(10, 100), max_regression=0.2) == []
+    regressions = compare(result(15, 70), result(10, 100), max_regression=0.2)
+    assert len(regressions) == 2
@@ -0,0 +1,20 @@
+from bloom import BloomFilter
+
+
+def test_added_items_are_always_found():
+    bloom = BloomFilter(capacity=1000, false_positive_rate=0.01)
+    items = [f"user{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+
+
+def test_false_positive_rate_stays_near_target():
+    bloom = BloomFilter(capacity=10_000, false_positive_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f"user{i}")
+    false_positives = sum(f"other{i}" in bloom for i in range(10_000))
+    assert false_positives < 200
+    assert 0.005 < bloom.false_positive_rate() < 0.02
+    # ~9.6 bits per item at 1%
+    assert bloom.memory_bytes < 10_000 * 10 // 8 + 1
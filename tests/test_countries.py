@@ -0,0 +1,38 @@
+import pytest
+from sqlmodel import select
+import metrics
+from countries import allowed_countries
+from db import get_session, insert_allowed_countries, insert_ignoring_duplicates
+from models import AllowedCountry
+
+
+@pytest.mark.asyncio
+async def test_allow_list_is_checked_without_queries():
+    await allowed_countries.load()
+    queries = metrics.db_queries
+    assert await allowed_countries.is_allowed("NL")
+    assert not await allowed_countries.is_allowed("XX")
+    assert metrics.db_queries == queries
+
+
+@pytest.mark.asyncio
+async def test_new_country_is_picked_up_after_invalidation():
+    with next(get_session()) as session:
+        insert_ignoring_duplicates(session, AllowedCountry, [{"iso_code": "LU"}])
+        session.commit()
+    await allowed_countries.load()
+    assert await allowed_countries.is_allowed("LU")
+
+    # Removing it through the ORM invalidates the list in this process
+    with next(get_session()) as session:
+        session.delete(session.get(AllowedCountry, "LU"))
+        session.commit()
+    assert not await allowed_countries.is_allowed("LU")
+
+
+def test_bulk_insert_skips_existing_countries():
+    with next(get_session()) as session:
+        insert_allowed_countries(session)
+        insert_allowed_countries(session)
+        codes = session.exec(select(AllowedCountry.iso_code)).all()
+    assert sorted(code for code in codes if code in {"NL", "BE", "DE"}) == ["BE", "DE", "NL"]
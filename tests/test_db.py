@@ -0,0 +1,152 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import inspect
+from sqlmodel import SQLModel, create_engine, select
+from config import settings
+from db import get_async_database_url, async_session, AwaitableSession
+from main import app
+from migrations import migrate, LATEST_VERSION
+from models import AllowedCountry
+from tests.test_account import register_and_logon
+
+
+def test_async_database_url_derived_from_database_url(monkeypatch):
+    monkeypatch.setattr(settings, "database_url", "sqlite:///bank.sqlite")
+    monkeypatch.setattr(settings, "async_database_url", None)
+    assert get_async_database_url() == "sqlite+aiosqlite:///bank.sqlite"
+
+    monkeypatch.setattr(settings, "async_database_url", "postgresql+psycopg://db/bank")
+    assert get_async_database_url() == "postgresql+psycopg://db/bank"
+
+
+@pytest.mark.asyncio
+async def test_sync_mode_wraps_blocking_session():
+    async with async_session() as session:
+        assert isinstance(session, AwaitableSession)
+
+
+@pytest.mark.asyncio
+async def test_account_flow_on_async_engine(async_mode):
+    """Register, logon, open and overview all work through AsyncSession."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        resp = await ac.post("/accounts/open", headers=headers, json={"account_type": "saving", "currency": "USD"})
+        assert resp.status_code == 201
+
+        resp = await ac.get("/accounts/overview", headers=headers)
+        assert resp.status_code == 200
+        assert {a["account_type"] for a in resp.json()["accounts"]} == {"checking", "saving"}
+
+        resp = await ac.get("/health")
+        assert resp.status_code == 200
+
+
+def test_migrate_adds_indexes_to_existing_database(tmp_path):
+    """A database created before the indexes and columns were declared gets them on migrate."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in ["ix_customer_username", "ix_account_iban", "ix_account_customer_id_created_at_id"]:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        conn.exec_driver_sql("CREATE INDEX ix_account_customer_id ON account (customer_id)")
+        conn.exec_driver_sql("ALTER TABLE customer ADD COLUMN accounts_version INTEGER NOT NULL DEFAULT 0")
+        conn.exec_driver_sql("DELETE FROM schemaversion")
+
+    assert migrate(engine)[-1] == LATEST_VERSION
+    indexes = {i["name"]: i["unique"] for t in ["customer", "account"] for i in inspect(engine).get_indexes(t)}
+    assert indexes["ix_customer_username"]
+    assert indexes["ix_account_iban"]
+    assert "ix_account_customer_id_created_at_id" in indexes
+    assert "ix_account_customer_id" not in indexes
+    assert "accounts_version" not in {c["name"] for c in inspect(engine).get_columns("customer")}
+
+    # Already up to date
+    assert migrate(engine) == []
+
+
+def test_migrate_moves_balances_to_minor_units(tmp_path):
+    """Decimal balances of a database from before integer storage are converted per currency exponent."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE account DROP COLUMN balance_minor")
+        conn.exec_driver_sql("ALTER TABLE account ADD COLUMN balance NUMERIC(18, 2) NOT NULL DEFAULT 0")
+        for i, (currency, balance) in enumerate([("EUR", "0.29"), ("USD", "1234.56"), ("JPY", "500")]):
+            conn.exec_driver_sql(
+                "INSERT INTO account (id, iban, account_type, currency, created_at, customer_id, balance) "
+                f"VALUES ('{i}', 'NL0{i}', 'checking', '{currency}', '2020-01-01', 'c', {balance})"
+            )
+        conn.exec_driver_sql("DELETE FROM schemaversion")
+
+    assert migrate(engine)[-1] == LATEST_VERSION
+    assert "balance" not in {c["name"] for c in inspect(engine).get_columns("account")}
+    with engine.connect() as conn:
+        rows = dict(conn.exec_driver_sql("SELECT currency, balance_minor FROM account").all())
+    assert rows == {"EUR": 29, "USD": 123456, "JPY": 500}
+
+
+def test_migrate_moves_ledger_amounts_to_minor_units(tmp_path):
+    """Transfer and ledger amounts are converted with the exponent of the transfer's currency."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE transfer DROP COLUMN amount_minor")
+        conn.exec_driver_sql("ALTER TABLE transfer ADD COLUMN amount NUMERIC(18, 2) NOT NULL DEFAULT 0")
+        for column in ["amount_minor", "balance_after_minor"]:
+            conn.exec_driver_sql(f"ALTER TABLE ledgerentry DROP COLUMN {column}")
+        for column in ["amount", "balance_after"]:
+            conn.exec_driver_sql(f"ALTER TABLE ledgerentry ADD COLUMN {column} NUMERIC(18, 2) NOT NULL DEFAULT 0")
+        for i, (currency, amount, balance_after) in enumerate([("EUR", "0.29", "9.71"), ("KWD", "1.005", "8.995")]):
+            conn.exec_driver_sql(
+                "INSERT INTO transfer (id, source_account_id, target_account_id, currency, created_at, amount) "
+                f"VALUES ('t{i}', 'a', 'b', '{currency}', '2020-01-01', {amount})"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO ledgerentry (account_id, transfer_id, created_at, amount, balance_after) "
+                f"VALUES ('a', 't{i}', '2020-01-01', -{amount}, {balance_after})"
+            )
+        conn.exec_driver_sql("DELETE FROM schemaversion")
+
+    assert migrate(engine)[-1] == LATEST_VERSION
+    assert "amount" not in {c["name"] for c in inspect(engine).get_columns("transfer")}
+    assert "balance_after" not in {c["name"] for c in inspect(engine).get_columns("ledgerentry")}
+    with engine.connect() as conn:
+        transfers = dict(conn.exec_driver_sql("SELECT id, amount_minor FROM transfer").all())
+        entries = {t: (a, b) for t, a, b in conn.exec_driver_sql(
+            "SELECT transfer_id, amount_minor, balance_after_minor FROM ledgerentry").all()}
+    assert transfers == {"t0": 29, "t1": 1005}
+    assert entries == {"t0": (-29, 971), "t1": (-1005, 8995)}
+
+
+def test_engine_options_apply_pool_settings(monkeypatch):
+    from db import engine_options
+    monkeypatch.setattr(settings, "db_pool_size", 7)
+    assert engine_options("postgresql://db/bank")["pool_size"] == 7
+    assert "pool_size" not in engine_options("sqlite://")
+
+
+@pytest.mark.asyncio
+async def test_reads_use_replica(monkeypatch):
+    import db
+    monkeypatch.setattr(settings, "read_replica_url", settings.database_url)
+    monkeypatch.setattr(db, "_replica_retry_at", 0.0)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        resp = await ac.get("/accounts/overview", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    assert "replica_0_checkedin" in db.pool_stats()
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_falls_back_to_primary(monkeypatch, tmp_path):
+    import db
+    monkeypatch.setattr(settings, "read_replica_url", f"sqlite:///{tmp_path}/missing/dir/replica.sqlite")
+    monkeypatch.setattr(db, "_replica_retry_at", 0.0)
+    fallbacks = db.replica_fallbacks
+    for _ in range(2):
+        async with db.async_read_session() as session:
+            assert (await session.exec(select(AllowedCountry))).first() is not None
+    # The second read skipped the replica while it is cooling down
+    assert db.replica_fallbacks == fallbacks + 1
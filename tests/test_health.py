@@ -8,4 +8,52 @@ async def test_health_ok():
         response = await ac.get("/health")
     assert response.status_code == 200
     data = response.json()
-    assert data.get("status") == "ok"
\ No newline at end of file
+    assert data.get("status") == "ok"
+
+@pytest.mark.asyncio
+async def test_health_endpoints_answer_from_the_last_probe():
+    import health
+    import metrics
+
+    await health.probe.probe()
+    queries = metrics.db_queries
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        live = await ac.get("/health/live")
+        ready = await ac.get("/health/ready")
+        for _ in range(5):
+            assert (await ac.get("/health")).status_code == 200
+    assert metrics.db_queries == queries
+
+    assert live.json() == {"status": "ok"}
+    assert ready.status_code == 200
+    data = ready.json()
+    assert data["database"] == "connected"
+    assert data["latency_ms"] >= 0
+    assert 0 <= data["pool_saturation"] < 1
+
+
+@pytest.mark.asyncio
+async def test_hanging_database_fails_readiness_within_timeout(monkeypatch):
+    import threading
+    import health
+
+    release = threading.Event()
+    monkeypatch.setattr(health, "_ping", lambda: release.wait(5))
+    monkeypatch.setattr(health.probe, "timeout", 0.05)
+    try:
+        await health.probe.probe()
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            ready = await ac.get("/health/ready")
+            health_resp = await ac.get("/health")
+            live = await ac.get("/health/live")
+    finally:
+        release.set()
+
+    assert ready.status_code == 503
+    assert ready.json()["error"].startswith("no answer")
+    assert health_resp.status_code == 503
+    assert live.status_code == 200
+
+    monkeypatch.undo()
+    await health.probe.probe()
+    assert health.probe.database_ok
@@ -0,0 +1,37 @@
+import pytest
+from iban import IbanAllocator, account_number_to_iban, generate_ibans, generate_ibans_async, reserve_account_numbers
+from utils import _iban_check_digits, generate_iban, is_valid_iban
+
+
+def test_check_digits_match_known_iban():
+    assert _iban_check_digits("NL", "ABNA0417164300") == "91"
+    assert is_valid_iban("NL91ABNA0417164300")
+    assert not is_valid_iban("NL92ABNA0417164300")
+    assert is_valid_iban(generate_iban())
+
+
+def test_reservations_never_overlap():
+    first = reserve_account_numbers(10)
+    second = reserve_account_numbers(5)
+    assert len(first) == 10 and len(second) == 5
+    assert second.start >= first.stop
+
+
+def test_account_numbers_map_to_distinct_valid_ibans():
+    ibans = [account_number_to_iban(number) for number in range(10_000)]
+    assert len(set(ibans)) == len(ibans)
+    assert all(is_valid_iban(iban) for iban in ibans)
+
+
+def test_allocators_in_separate_workers_never_collide():
+    """Two allocators (as in two worker processes) draw from disjoint blocks."""
+    a, b = IbanAllocator(block_size=8), IbanAllocator(block_size=8)
+    ibans = a.take(5) + b.take(20) + a.take(12) + b.take(1)
+    assert len(set(ibans)) == len(ibans) == 38
+
+
+@pytest.mark.asyncio
+async def test_generate_ibans_batch():
+    ibans = generate_ibans(3) + await generate_ibans_async(2)
+    assert len(set(ibans)) == 5
+    assert all(iban.startswith("NL") and iban[4:8] == "OBAP" for iban in ibans)
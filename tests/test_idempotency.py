@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import uuid
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient, ASGITransport
+from db import get_session
+from idempotency import store
+from main import app
+from models import IdempotencyKey
+from schemas import CustomerCreate
+from tests.test_account import fake, register_and_logon
+
+
+def registration():
+    return {
+        "name": fake.name(),
+        "dob": "1990-01-01",
+        "address": fake.address(),
+        "country": "NL",
+        "id_document": fake.bothify(text="ID#######"),
+        "username": fake.user_name()[:12] + fake.bothify(text="####"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_register_retry_replays_the_first_response():
+    payload = registration()
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = await ac.post("/customers/register", json=payload, headers=headers)
+        retry = await ac.post("/customers/register", json=payload, headers=headers)
+        store.cache.clear()  # the replay also works from the table, e.g. on another worker
+        elsewhere = await ac.post("/customers/register", json=payload, headers=headers)
+
+    assert first.status_code == retry.status_code == elsewhere.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    # The generated password is only in the first response, not kept with the key anywhere
+    assert retry.json() == elsewhere.json() == {"username": payload["username"]}
+    with next(get_session()) as session:
+        row = session.get(IdempotencyKey, f"register:{headers['Idempotency-Key']}")
+    assert first.json()["password"] not in row.response_body
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_open_one_account():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": str(uuid.uuid4())}
+        responses = await asyncio.gather(*[
+            ac.post("/accounts/open", headers=headers, json={"account_type": "saving"}) for _ in range(3)
+        ])
+        overview = await ac.get("/accounts/overview", headers={"Authorization": f"Bearer {token}"})
+
+    assert [r.status_code for r in responses] == [201] * 3
+    assert len({r.json()["iban"] for r in responses}) == 1
+    assert len(overview.json()["accounts"]) == 2  # the checking account from registration, plus one
+
+
+@pytest.mark.asyncio
+async def test_key_reused_with_another_request_is_rejected():
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.post("/customers/register", json=registration(), headers=headers)).status_code == 201
+        resp = await ac.post("/customers/register", json=registration(), headers=headers)
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_failed_request_releases_its_key():
+    payload = {**registration(), "country": "XX"}
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.post("/customers/register", json=payload, headers=headers)).status_code == 403
+        with next(get_session()) as session:
+            assert session.get(IdempotencyKey, f"register:{headers['Idempotency-Key']}") is None
+
+        resp = await ac.post("/customers/register", json={**payload, "country": "NL"}, headers=headers)
+    assert resp.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_key_in_progress_on_another_worker_conflicts():
+    key, payload = str(uuid.uuid4()), registration()
+    fingerprint = hashlib.sha256(CustomerCreate(**payload).model_dump_json().encode()).hexdigest()
+    with next(get_session()) as session:
+        session.add(IdempotencyKey(key=f"register:{key}", fingerprint=fingerprint,
+                                   expires_at=datetime.now(timezone.utc) + timedelta(minutes=5)))
+        session.commit()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.post("/customers/register", json=payload, headers={"Idempotency-Key": key})
+    assert resp.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_are_purged():
+    key = f"register:{uuid.uuid4()}"
+    with next(get_session()) as session:
+        session.add(IdempotencyKey(key=key, fingerprint="0" * 64, status_code=201, response_body="{}",
+                                   expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        session.commit()
+    assert await store.purge_expired() >= 1
+    with next(get_session()) as session:
+        assert session.get(IdempotencyKey, key) is None
@@ -0,0 +1,35 @@
+import re
+import pytest
+from httpx import AsyncClient, ASGITransport
+from main import app
+from tests.test_account import register_and_logon
+
+
+@pytest.mark.asyncio
+async def test_server_timing_reports_db_queries():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        _, token = await register_and_logon(ac)
+        resp = await ac.get("/accounts/overview", headers={"Authorization": f"Bearer {token}"})
+
+    assert resp.status_code == 200
+    timing = re.search(r'app;dur=([\d.]+), db;dur=([\d.]+);desc="(\d+) queries"', resp.headers["Server-Timing"])
+    assert timing
+    # principal and token are cached after logon, only the accounts query remains
+    assert int(timing.group(3)) == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exports_prometheus_text():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/health")
+        await ac.get("/no/such/path")
+        resp = await ac.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert 'openbank_http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert 'route="unmatched",status="404"' in body
+    assert 'openbank_http_request_duration_seconds_bucket{method="GET",route="/health",le="+Inf"}' in body
+    assert "openbank_db_queries_total" in body
+    assert "openbank_token_cache_hits" in body
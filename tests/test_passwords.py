@@ -0,0 +1,61 @@
+import pytest
+from fastapi import HTTPException
+from config import settings
+from passwords import PasswordHasher, hash_password, needs_rehash, verify_password, verify_password_async
+
+
+def test_hash_roundtrip():
+    stored = hash_password("correct horse")
+    assert stored.startswith("scrypt$")
+    assert "correct horse" not in stored
+    assert verify_password("correct horse", stored)
+    assert not verify_password("wrong horse", stored)
+    assert hash_password("correct horse") != stored  # salted
+
+
+def test_legacy_plaintext_is_verified_and_flagged_for_rehash():
+    assert verify_password("Plaintext123", "Plaintext123")
+    assert not verify_password("Plaintext124", "Plaintext123")
+    assert needs_rehash("Plaintext123")
+
+
+def test_cost_change_flags_rehash(monkeypatch):
+    stored = hash_password("secret-password")
+    assert not needs_rehash(stored)
+    monkeypatch.setattr(settings, "password_hash_n", settings.password_hash_n * 2)
+    assert needs_rehash(stored)
+    assert verify_password("secret-password", stored)  # old hashes keep working
+
+
+@pytest.mark.asyncio
+async def test_unknown_user_still_costs_a_hash():
+    assert not await verify_password_async("anything", None)
+
+
+@pytest.mark.asyncio
+async def test_dummy_hash_is_made_off_the_event_loop(monkeypatch):
+    import threading
+    import passwords
+
+    threads = []
+    def recording_hash(password):
+        threads.append(threading.current_thread())
+        return hash_password(password)
+
+    monkeypatch.setattr(passwords, "_dummy_hash", None)
+    monkeypatch.setattr(passwords, "hash_password", recording_hash)
+    assert not await verify_password_async("anything", None)
+    assert threads and threading.main_thread() not in threads
+
+
+@pytest.mark.asyncio
+async def test_hasher_rejects_beyond_max_pending():
+    hasher = PasswordHasher(workers=1, max_pending=0)
+    with pytest.raises(HTTPException) as e:
+        await hasher.run(hash_password, "secret-password")
+    assert e.value.status_code == 503
+    assert hasher.stats()["rejected"] == 1
+
+    hasher = PasswordHasher(workers=1, max_pending=4)
+    assert verify_password("secret-password", await hasher.run(hash_password, "secret-password"))
+    assert hasher.stats()["calls"] == 1
@@ -0,0 +1,49 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from main import app
+from ratelimit import MemoryBackend, logon_username_limit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    backend = MemoryBackend(max_keys=10, clock=clock)
+    assert [backend.hit("k", rate=1, burst=3) for _ in range(3)] == [0, 0, 0]
+    assert backend.hit("k", rate=1, burst=3) == pytest.approx(1)
+
+    clock.now = 1.5
+    assert backend.hit("k", rate=1, burst=3) == 0
+    assert backend.hit("k", rate=1, burst=3) == pytest.approx(0.5)
+    assert backend.hit("other", rate=1, burst=3) == 0
+
+
+def test_least_recently_used_buckets_are_evicted():
+    backend = MemoryBackend(max_keys=2)
+    for key in ["a", "b", "c"]:
+        backend.hit(key, rate=1, burst=1)
+    assert backend.stats()["keys"] == 2
+    assert backend.stats()["evictions"] == 1
+    assert backend.hit("a", rate=1, burst=1) == 0  # evicted, so full again
+
+
+@pytest.mark.asyncio
+async def test_logon_attempts_for_a_username_are_limited(monkeypatch):
+    monkeypatch.setattr(logon_username_limit, "burst", 2)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        statuses = []
+        for _ in range(3):
+            resp = await ac.post("/auth/logon", data={"username": "victim", "password": "guess"})
+            statuses.append(resp.status_code)
+        assert statuses == [401, 401, 429]
+        assert int(resp.headers["Retry-After"]) >= 1
+
+        # Other usernames are not affected
+        resp = await ac.post("/auth/logon", data={"username": "someone-else", "password": "guess"})
+        assert resp.status_code == 401
@@ -67,4 +67,65 @@ async def test_register_disallowed_country():
         response = await ac.post("/customers/register", json=payload)
 
     assert response.status_code == 403
-    assert response.json()["detail"] == "Registration not allowed from this country"
\ No newline at end of file
+    assert response.json()["detail"] == "Registration not allowed from this country"
+
+@pytest.mark.asyncio
+async def test_group_commit_gives_every_registration_its_own_result(monkeypatch):
+    """Concurrent registrations are committed in batches; a username taken twice still gets one 409."""
+    import asyncio
+    import groupcommit
+    from config import settings
+
+    batcher = groupcommit.RegistrationBatcher(max_batch=4, max_delay=0.05)
+    monkeypatch.setattr(groupcommit, "registrations", batcher)
+    monkeypatch.setattr(settings, "register_group_commit", True)
+
+    def payload(username):
+        return {
+            "name": fake.name(),
+            "dob": "1990-01-01",
+            "address": fake.address(),
+            "country": "NL",
+            "id_document": fake.bothify(text="ID#######"),
+            "username": username,
+        }
+
+    usernames = [fake.user_name()[:12] + fake.bothify(text="####") for _ in range(6)]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        responses = await asyncio.gather(*[
+            ac.post("/customers/register", json=payload(username)) for username in usernames + usernames[:1]
+        ])
+        logon = await ac.post("/auth/logon", data={"username": usernames[1], "password": responses[1].json()["password"]})
+
+    assert sorted(r.status_code for r in responses) == [201] * 6 + [409]
+    assert logon.status_code == 200
+    stats = batcher.stats()
+    assert stats["registrations"] == 7
+    assert stats["batches"] < 7
+    assert stats["largest_batch"] <= 4
+
+
+@pytest.mark.asyncio
+async def test_group_commit_survives_a_cancelled_submitter(async_mode):
+    """The caller that fills a batch going away does not abort the commit the others wait on."""
+    import asyncio
+    import groupcommit
+    from datetime import date
+    from uuid import uuid4
+    from models import Account, Customer
+
+    def registration():
+        customer = Customer(name=fake.name(), dob=date(1990, 1, 1), address=fake.address(), country="NL",
+                            id_document="ID1", username=fake.user_name()[:12] + fake.bothify(text="####"),
+                            password="x")
+        return customer, Account(iban=f"NL00TEST{uuid4().int % 10**10:010d}", customer_id=customer.id)
+
+    batcher = groupcommit.RegistrationBatcher(max_batch=2, max_delay=60)
+    waiting = asyncio.create_task(batcher.submit(*registration()))
+    await asyncio.sleep(0)
+    filling = asyncio.create_task(batcher.submit(*registration()))
+    await asyncio.sleep(0)
+    filling.cancel()
+
+    await asyncio.wait_for(waiting, timeout=5)
+    assert batcher.stats()["registrations"] == 2
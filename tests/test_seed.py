@@ -0,0 +1,53 @@
+from uuid import uuid4
+from sqlmodel import select, func
+from db import get_session
+from models import Customer, Account
+from seed import generate_chunk, seed
+
+
+def test_generate_chunk_is_deterministic():
+    """The same seed and chunk always produce the same rows."""
+    first_customers, first_accounts = generate_chunk((42, 100, 5, 3, "hash"))
+    again_customers, again_accounts = generate_chunk((42, 100, 5, 3, "hash"))
+    fields = ["id", "username", "name", "country"]
+    assert [[c[f] for f in fields] for c in first_customers] == [[c[f] for f in fields] for c in again_customers]
+    assert [a["id"] for a in first_accounts] == [a["id"] for a in again_accounts]
+
+    assert all(len(c["username"]) <= 20 for c in first_customers)
+    assert all(1 <= sum(a["customer_id"] == c["id"] for a in first_accounts) <= 3 for c in first_customers)
+
+
+def test_seed_inserts_unique_rows_in_batches():
+    with next(get_session()) as session:
+        customers_before = session.exec(select(func.count()).select_from(Customer)).one()
+        accounts_before = session.exec(select(func.count()).select_from(Account)).one()
+
+    seed(25, batch_size=10, workers=1, random_seed=7)
+
+    with next(get_session()) as session:
+        assert session.exec(select(func.count()).select_from(Customer)).one() == customers_before + 25
+        assert session.exec(select(func.count()).select_from(Account)).one() >= accounts_before + 25
+        usernames = session.exec(select(Customer.username)).all()
+        ibans = session.exec(select(Account.iban)).all()
+    assert len(usernames) == len(set(usernames))
+    assert len(ibans) == len(set(ibans))
+
+
+def test_seed_skips_customers_that_already_exist():
+    """A re-run over the same numbers, or a username taken through the API, is skipped, not fatal."""
+    start = 10**12 + uuid4().int % 10**12  # clear of other runs' numbers
+    customers, _ = generate_chunk((11, start, 3, 1, "hash"))
+    with next(get_session()) as session:
+        session.add(Customer(**{**customers[0], "id": uuid4()}))  # same username, registered elsewhere
+        session.commit()
+
+    seed(3, max_accounts=1, random_seed=11, start=start)
+    seed(3, max_accounts=1, random_seed=11, start=start)
+
+    with next(get_session()) as session:
+        usernames = session.exec(select(Customer.username).where(
+            Customer.username.in_([c["username"] for c in customers]))).all()
+        accounts = session.exec(select(func.count()).select_from(Account).where(
+            Account.customer_id.in_([c["id"] for c in customers]))).one()
+    assert sorted(usernames) == sorted(c["username"] for c in customers)
+    assert accounts == 2
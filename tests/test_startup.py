@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+COLD_START = """
+import asyncio, json
+import db, startup
+from main import app
+
+imported_without_engine = db._engine is None
+
+async def start():
+    async with app.router.lifespan_context(app):
+        return dict(startup.phases), startup.ddl_skipped
+
+first, first_skipped = asyncio.run(start())
+second, second_skipped = asyncio.run(start())
+print(json.dumps({"lazy": imported_without_engine, "first": first, "first_skipped": first_skipped,
+                  "second": second, "second_skipped": second_skipped}))
+"""
+
+
+def test_fast_startup_skips_ddl_on_a_current_schema(tmp_path):
+    env = os.environ | {"DATABASE_URL": f"sqlite:///{tmp_path / 'bank.sqlite'}", "FAST_STARTUP": "true"}
+    result = subprocess.run([sys.executable, "-c", COLD_START], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    # The lifespan prints its goodbye after the report
+    report = json.loads([line for line in result.stdout.splitlines() if line.startswith("{")][-1])
+
+    assert report["lazy"]
+    assert not report["first_skipped"]
+    assert report["second_skipped"]
+    assert set(report["first"]) == {"import", "schema", "reference_data", "health_probe"}
+    assert sum(report["second"].values()) < 5
@@ -0,0 +1,209 @@
+import asyncio
+import csv
+import io
+import json
+import pytest
+from decimal import Decimal
+from uuid import UUID
+from httpx import AsyncClient, ASGITransport
+from sqlmodel import select
+from db import fund_account, get_session
+from main import app
+from models import Account, LedgerEntry
+from tests.test_account import register_and_logon
+
+
+def fund(iban: str, amount: str):
+    with next(get_session()) as session:
+        fund_account(session, iban, Decimal(amount))
+
+def balance(iban: str) -> Decimal:
+    with next(get_session()) as session:
+        return session.exec(select(Account).where(Account.iban == iban)).one().balance
+
+async def customer_with_account(ac: AsyncClient, currency: str = "EUR") -> tuple[dict, str]:
+    """Register a customer; returns their auth headers and the IBAN of an account in `currency`."""
+    _, token = await register_and_logon(ac)
+    headers = {"Authorization": f"Bearer {token}"}
+    if currency == "EUR":
+        resp = await ac.get("/accounts/overview", headers=headers)
+        return headers, resp.json()["accounts"][0]["iban"]
+    resp = await ac.post("/accounts/open", headers=headers, json={"account_type": "saving", "currency": currency})
+    return headers, resp.json()["iban"]
+
+
+@pytest.mark.asyncio
+async def test_transfer_moves_money_and_writes_ledger():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers, source = await customer_with_account(ac)
+        _, target = await customer_with_account(ac)
+        fund(source, "100.00")
+
+        resp = await ac.post("/transfers", headers=headers, json={
+            "from_iban": source, "to_iban": target, "amount": "30.50", "reference": "rent",
+        })
+
+    assert resp.status_code == 201
+    data = resp.json()
+    assert data["amount"] == "30.50"
+    assert data["balance_after"] == "69.50"
+    assert balance(source) == Decimal("69.50")
+    assert balance(target) == Decimal("30.50")
+
+    with next(get_session()) as session:
+        entries = session.exec(select(LedgerEntry).where(LedgerEntry.transfer_id == UUID(data["id"]))).all()
+    assert sorted(e.amount_minor for e in entries) == [-3050, 3050]
+
+
+@pytest.mark.asyncio
+async def test_transfer_rejections_leave_balances_untouched():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers, source = await customer_with_account(ac)
+        other_headers, target = await customer_with_account(ac)
+        _, dollars = await customer_with_account(ac, currency="USD")
+        fund(source, "10.00")
+
+        def transfer(from_iban, to_iban, amount="20.00", as_headers=headers):
+            return ac.post("/transfers", headers=as_headers,
+                           json={"from_iban": from_iban, "to_iban": to_iban, "amount": amount})
+
+        assert (await transfer(source, target)).status_code == 409
+        assert (await transfer(source, dollars, amount="1.00")).status_code == 422
+        assert (await transfer(source, source, amount="1.00")).status_code == 422
+        assert (await transfer(source, "NL00OBAP0000000000", amount="1.00")).status_code == 404
+        # Only the owner can debit an account
+        assert (await transfer(source, target, amount="1.00", as_headers=other_headers)).status_code == 404
+        assert (await transfer(source, target, amount="-1.00")).status_code == 422
+
+    assert balance(source) == Decimal("10.00")
+    assert balance(target) == Decimal("0.00")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_transfers_never_overdraw(async_mode):
+    """Twenty concurrent 1.00 debits against a 10.00 balance: exactly ten are booked."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers, source = await customer_with_account(ac)
+        _, target = await customer_with_account(ac)
+        fund(source, "10.00")
+
+        responses = await asyncio.gather(*[
+            ac.post("/transfers", headers=headers, json={"from_iban": source, "to_iban": target, "amount": "1.00"})
+            for _ in range(20)
+        ])
+
+    assert sorted(r.status_code for r in responses) == [201] * 10 + [409] * 10
+    assert balance(source) == Decimal("0.00")
+    assert balance(target) == Decimal("10.00")
+
+
+@pytest.mark.asyncio
+async def test_export_streams_entries_as_ndjson_and_csv():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers, source = await customer_with_account(ac)
+        other_headers, target = await customer_with_account(ac)
+        fund(source, "100.00")
+        for amount in ["1.00", "2.00", "3.00"]:
+            resp = await ac.post("/transfers", headers=headers,
+                                 json={"from_iban": source, "to_iban": target, "amount": amount, "reference": "x"})
+            assert resp.status_code == 201
+
+        resp = await ac.get(f"/accounts/{source}/entries", headers=headers)
+        assert resp.headers["content-type"] == "application/x-ndjson"
+        entries = [json.loads(line) for line in resp.text.splitlines()]
+        assert [e["amount"] for e in entries] == ["-1.00", "-2.00", "-3.00"]
+        assert entries[-1]["balance_after"] == "94.00"
+        assert {e["counterparty_iban"] for e in entries} == {target}
+
+        # Resume after the first entry
+        resp = await ac.get(f"/accounts/{source}/entries", headers=headers, params={"after": entries[0]["id"]})
+        assert [json.loads(line)["amount"] for line in resp.text.splitlines()] == ["-2.00", "-3.00"]
+
+        resp = await ac.get(f"/accounts/{target}/entries", headers=other_headers,
+                            params={"format": "csv", "start": "2000-01-01T00:00:00Z"})
+        rows = list(csv.DictReader(io.StringIO(resp.text)))
+        assert [r["amount"] for r in rows] == ["1.00", "2.00", "3.00"]
+        assert rows[0]["counterparty_iban"] == source
+
+        resp = await ac.get(f"/accounts/{target}/entries", headers=other_headers, params={"end": "2000-01-01T00:00:00Z"})
+        assert resp.text == ""
+
+        # Only the owner can export
+        assert (await ac.get(f"/accounts/{source}/entries", headers=other_headers)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_amounts_follow_the_currency_exponent():
+    """Yen have no minor unit: balances are whole numbers and fractional amounts are rejected."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers, source = await customer_with_account(ac, currency="JPY")
+        _, target = await customer_with_account(ac, currency="JPY")
+        fund(source, "1000")
+
+        def transfer(amount):
+            return ac.post("/transfers", headers=headers, json={"from_iban": source, "to_iban": target, "amount": amount})
+
+        assert (await transfer("1.5")).status_code == 422
+        resp = await transfer("300")
+        assert resp.status_code == 201
+        assert resp.json()["balance_after"] == "700"
+
+        resp = await ac.get("/accounts/overview", headers=headers)
+        assert {a["iban"]: a["balance"] for a in resp.json()["accounts"]}[source] == "700"
+
+
+@pytest.mark.asyncio
+async def test_ledger_keeps_three_decimal_amounts():
+    """Kuwaiti dinar have three decimals: the ledger and its export match the balance to the fils."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers, source = await customer_with_account(ac, currency="KWD")
+        _, target = await customer_with_account(ac, currency="KWD")
+        fund(source, "10")
+
+        resp = await ac.post("/transfers", headers=headers, json={"from_iban": source, "to_iban": target, "amount": "1.005"})
+        assert resp.status_code == 201
+        assert resp.json()["amount"] == "1.005"
+        assert resp.json()["balance_after"] == "8.995"
+        assert balance(source) == Decimal("8.995")
+
+        resp = await ac.get(f"/accounts/{source}/entries", headers=headers)
+        entry, = [json.loads(line) for line in resp.text.splitlines()]
+        assert (entry["amount"], entry["balance_after"]) == ("-1.005", "8.995")
+
+        resp = await ac.get(f"/accounts/{source}/entries", headers=headers, params={"format": "csv"})
+        row, = csv.DictReader(io.StringIO(resp.text))
+        assert (row["amount"], row["balance_after"]) == ("-1.005", "8.995")
+
+
+@pytest.mark.asyncio
+async def test_export_bounds_with_an_offset_are_compared_in_utc():
+    from datetime import datetime, timedelta, timezone
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers, source = await customer_with_account(ac)
+        _, target = await customer_with_account(ac)
+        fund(source, "10.00")
+        resp = await ac.post("/transfers", headers=headers, json={"from_iban": source, "to_iban": target, "amount": "1.00"})
+        booked = datetime.fromisoformat(resp.json()["created_at"]).replace(tzinfo=timezone.utc)
+
+        # The same instants, written in UTC+02:00
+        plus_two = timezone(timedelta(hours=2))
+        before, after = (booked - timedelta(minutes=30)).astimezone(plus_two), (booked + timedelta(minutes=30)).astimezone(plus_two)
+        resp = await ac.get(f"/accounts/{source}/entries", headers=headers,
+                            params={"start": before.isoformat(), "end": after.isoformat()})
+        assert len(resp.text.splitlines()) == 1
+        resp = await ac.get(f"/accounts/{source}/entries", headers=headers, params={"start": after.isoformat()})
+        assert resp.text == ""
+
+
+@pytest.mark.asyncio
+async def test_transfer_changes_the_overview_etag():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        headers, source = await customer_with_account(ac)
+        _, target = await customer_with_account(ac)
+        fund(source, "10.00")
+        before = await ac.get("/accounts/overview", headers=headers)
+        await ac.post("/transfers", headers=headers, json={"from_iban": source, "to_iban": target, "amount": "1.00"})
+        after = await ac.get("/accounts/overview", headers={**headers, "If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.json()["accounts"][0]["balance"] == "9.00"
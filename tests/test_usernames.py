@@ -0,0 +1,61 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from faker import Faker
+from main import app
+from tests.test_account import register_and_logon
+from usernames import usernames
+
+fake = Faker()
+
+
+@pytest.fixture
+def username_filter(monkeypatch):
+    # Other tests run without the filter, as before the background build finishes
+    monkeypatch.setattr(usernames, "_bloom", None)
+    return usernames
+
+
+@pytest.mark.asyncio
+async def test_free_usernames_answered_without_database(username_filter):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        taken, _ = await register_and_logon(ac)
+        await username_filter.load()
+        assert username_filter.stats()["size"] >= 1
+
+        lookups = username_filter.database_lookups
+        resp = await ac.get("/customers/username-available", params={"username": "free-" + fake.pystr(max_chars=10)})
+        assert resp.status_code == 200
+        assert resp.json()["available"] is True
+        assert username_filter.database_lookups == lookups
+
+        resp = await ac.get("/customers/username-available", params={"username": taken})
+        assert resp.json() == {"username": taken, "available": False}
+        assert username_filter.database_lookups == lookups + 1
+
+        assert (await ac.get("/customers/username-available", params={"username": "ab"})).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_registrations_update_the_filter(username_filter):
+    await username_filter.load()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        username, _ = await register_and_logon(ac)
+        resp = await ac.get("/customers/username-available", params={"username": username})
+    assert resp.json()["available"] is False
+
+
+@pytest.mark.asyncio
+async def test_filter_is_built_off_the_event_loop(username_filter, monkeypatch):
+    import threading
+
+    threads = []
+    build = type(username_filter)._build
+
+    def recording_build(self):
+        threads.append(threading.current_thread())
+        return build(self)
+
+    monkeypatch.setattr(type(username_filter), "_build", recording_build)
+    await username_filter.load()
+    assert username_filter.loaded
+    assert threads and threading.main_thread() not in threads
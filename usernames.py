@@ -0,0 +1,122 @@
+"""In-memory pre-filter for username lookups.
+
+A Bloom filter of every registered username answers "definitely not taken"
+without a database round trip; only usernames it reports as possibly taken
+are looked up. It is built by streaming the usernames from the database in
+a worker thread at startup, rebuilt every `username_filter_refresh_seconds`
+to pick up registrations made by other workers, and updated by this
+worker's own registrations. Until the first build finishes every lookup
+goes to the database.
+
+Registration still relies on the unique index: a username registered on
+another worker since the last rebuild is reported free here, and the
+insert then fails with 409 as before.
+"""
+import asyncio
+import logging
+import time
+from sqlalchemy import func
+from sqlmodel import Session, select
+from bloom import BloomFilter
+from config import settings
+from db import async_read_session, get_engine, get_read_engine
+from models import Customer
+
+logger = logging.getLogger(__name__)
+
+LOAD_CHUNK_SIZE = 10_000
+
+
+class UsernameFilter:
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self._bloom: BloomFilter | None = None
+        # Registrations made while a build is streaming, added to the new filter once it is done
+        self._added_during_load: list[str] | None = None
+        self._loaded_at = 0.0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.definitely_free = 0
+        self.database_lookups = 0
+        self.false_positives = 0
+
+    async def load(self):
+        """Build a new filter in a thread and swap it in; lookups keep using the old one meanwhile."""
+        started = time.perf_counter()
+        self._added_during_load = []
+        try:
+            bloom = await asyncio.to_thread(self._build)
+            # Back on the event loop: nothing can register between these lines and the swap
+            for username in self._added_during_load:
+                bloom.add(username)
+        finally:
+            self._added_during_load = None
+        self._bloom = bloom
+        self._loaded_at = time.monotonic()
+        self.loads += 1
+        self.load_seconds = time.perf_counter() - started
+
+    def _build(self) -> BloomFilter:
+        # A blocking session in a worker thread: scanning every username must not hold up the event loop
+        engine = get_read_engine() if settings.read_replica_url else get_engine()
+        with Session(engine) as session:
+            count = session.exec(select(func.count()).select_from(Customer)).one()
+            # Room to grow until the next rebuild without exceeding the target false-positive rate
+            bloom = BloomFilter(max(self.capacity, 2 * count), self.false_positive_rate)
+            result = session.exec(select(Customer.username).execution_options(yield_per=LOAD_CHUNK_SIZE))
+            for partition in result.partitions():
+                for username in partition:
+                    bloom.add(username)
+        return bloom
+
+    async def refresh_forever(self, interval: float):
+        while True:
+            try:
+                await self.load()
+            except Exception:
+                # Keep answering from the last filter, or from the database before the first one
+                logger.exception("Building the username filter failed")
+            await asyncio.sleep(interval)
+
+    def add(self, username: str):
+        """Record a username this worker just registered."""
+        if self._bloom is not None:
+            self._bloom.add(username)
+        if self._added_during_load is not None:
+            self._added_during_load.append(username)
+
+    @property
+    def loaded(self) -> bool:
+        return self._bloom is not None
+
+    async def is_taken(self, username: str) -> bool:
+        if self._bloom is not None and username not in self._bloom:
+            self.definitely_free += 1
+            return False
+        self.database_lookups += 1
+        async with async_read_session() as session:
+            taken = (await session.exec(select(Customer.id).where(Customer.username == username))).first() is not None
+        if not taken and self._bloom is not None:
+            self.false_positives += 1
+        return taken
+
+    def stats(self) -> dict[str, float]:
+        bloom = self._bloom
+        return {
+            "loaded": 1 if bloom is not None else 0,
+            "size": bloom.count if bloom is not None else 0,
+            "capacity": bloom.capacity if bloom is not None else 0,
+            "memory_bytes": bloom.memory_bytes if bloom is not None else 0,
+            "hashes": bloom.hashes if bloom is not None else 0,
+            "expected_false_positive_rate": bloom.false_positive_rate() if bloom is not None else 0.0,
+            "loads": self.loads,
+            "load_seconds": self.load_seconds,
+            "age_seconds": time.monotonic() - self._loaded_at if bloom is not None else 0,
+            "definitely_free": self.definitely_free,
+            "database_lookups": self.database_lookups,
+            "false_positives": self.false_positives,
+        }
+
+
+usernames = UsernameFilter(settings.username_filter_capacity, settings.username_filter_false_positive_rate)
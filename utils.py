@@ -1,24 +1,40 @@
+import base64
+import hashlib
+import json
 import random
 import string
 import secrets
+from datetime import datetime
+from uuid import UUID
+
+
+# Letters as numbers (A=10, B=11, ..., Z=35) for the MOD-97-10 check
+_IBAN_LETTER_DIGITS = str.maketrans({ch: str(ord(ch) - 55) for ch in string.ascii_uppercase})
 
 
 def _iban_check_digits(country_code: str, bban: str) -> str:
     """Compute IBAN check digits using MOD-97-10.
     This is a simplified helper suitable for demo/testing purposes.
     """
-    # Move country code and placeholder check digits to the end
-    rearranged = bban + country_code + "00"
-    # Convert letters to numbers (A=10, B=11, ..., Z=35)
-    numeric = "".join(str(ord(ch) - 55) if ch.isalpha() else ch for ch in rearranged)
-    # Compute mod 97
-    remainder = 0
-    for ch in numeric:
-        remainder = (remainder * 10 + int(ch)) % 97
-    check_digits = 98 - remainder
+    # Move country code and placeholder check digits to the end,
+    # then take the remainder of the whole number in one integer operation
+    numeric = (bban + country_code + "00").translate(_IBAN_LETTER_DIGITS)
+    check_digits = 98 - int(numeric) % 97
     return f"{check_digits:02d}"
 
 
+def format_iban(country_code: str, bank_code: str, account_number: int) -> str:
+    """Build an NL-style IBAN (CCkk BBBB NNNNNNNNNN) from its parts."""
+    bban = f"{bank_code}{account_number:010d}"
+    return f"{country_code}{_iban_check_digits(country_code, bban)}{bban}"
+
+
+def is_valid_iban(iban: str) -> bool:
+    """Check the MOD-97-10 checksum of an IBAN."""
+    numeric = (iban[4:] + iban[:4]).upper().translate(_IBAN_LETTER_DIGITS)
+    return numeric.isdigit() and int(numeric) % 97 == 1
+
+
 def generate_iban(country_code: str = "NL") -> str:
     """Generate a pseudo-random IBAN.
 
@@ -29,13 +45,11 @@ def generate_iban(country_code: str = "NL") -> str:
         - BBBB: bank code (4 letters)
         - CCCCCCCCCC: 10 digits account number
     - For other country codes, it will still return an NL-style IBAN with the requested country prefix.
+    - Nothing prevents collisions; accounts get their IBAN from `iban.generate_ibans` instead.
     """
     country_code = (country_code or "NL").upper()
-    bank_code = "".join(random.choice(string.ascii_uppercase) for _ in range(4))
-    account_number = "".join(random.choice(string.digits) for _ in range(10))
-    bban = f"{bank_code}{account_number}"
-    check = _iban_check_digits(country_code, bban)
-    return f"{country_code}{check}{bban}"
+    bank_code = "".join(random.choices(string.ascii_uppercase, k=4))
+    return format_iban(country_code, bank_code, random.randrange(10**10))
 
 
 def generate_password(length: int = 12) -> str:
@@ -52,3 +66,34 @@ def generate_password(length: int = 12) -> str:
         pwd = "".join(secrets.choice(alphabet) for _ in range(length))
         if any(c.islower() for c in pwd) and any(c.isupper() for c in pwd) and any(c.isdigit() for c in pwd):
             return pwd
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Encode a keyset position (created_at, id) as an opaque URL-safe cursor."""
+    raw = json.dumps([created_at.isoformat(), row_id.hex]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Inverse of encode_cursor. Raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(hex=row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def make_etag(*parts) -> str:
+    """A strong ETag over the given parts; equal parts give equal tags."""
+    digest = hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header value covers `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))